@@ -0,0 +1,232 @@
+"""Concurrent load generator for the LangGraph API server.
+
+Start the server with the stubbed graphs (`langgraph dev --config langgraph.loadtest.json`,
+or point the API container at that config) and run:
+
+    python -m perf.load --url http://localhost:2024 --concurrency 1,2,4,8,16 --output report.json
+
+For every graph in `langgraph.json` and every concurrency level N, N threads are created and
+each one plays the graph's multi-turn script. Time to first event, time to completion and the
+error rate are recorded per turn and summarized into a throughput/latency curve. Pass
+`--compare baseline.json` to diff against a report from another commit.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+from langgraph_sdk import get_client
+
+from perf import ROOT, git_commit
+
+# Realistic multi-turn conversations per graph id, with the runtime context each graph expects
+SCRIPTS: dict[str, dict] = {
+    "simple-agent": {
+        "context": {
+            "token": "stub",
+            "model": "llama-3.3-70b-versatile",
+            "temperature": 0.5,
+            "max_tokens": 512,
+            "messages_strategy": "summarize",
+            "message_strategy_keep": 6,
+            "message_strategy_summarize": 6,
+            "message_strategy_delete": 4,
+            "agentic_tools": ["add", "multiply", "divide"],
+            "workflow_tools": ["tavily", "wikipedia"],
+        },
+        "turns": [
+            "Who designed the Eiffel Tower?",
+            "How tall is it compared to the Empire State Building?",
+            "Multiply its height by 3.",
+            "Summarize what we talked about.",
+        ],
+    },
+    "tools-mcp-agent": {
+        "context": {"model": "gpt-5-nano"},
+        "turns": [
+            "List the files in the current directory.",
+            "How many of them are Python files?",
+        ],
+    },
+    "coding-assistant-agent": {
+        "context": {"token": "stub", "model": "gpt-5-nano"},
+        "turns": [
+            "Give me an overview of the project structure.",
+            "Suggest an improvement to the error handling of the main module.",
+        ],
+    },
+    "agent-with-subagents": {
+        "context": {
+            "token": "stub",
+            "main_model": "openai/gpt-oss-120b",
+            "sql_model": "openai/gpt-oss-120b",
+            "analyst_model": "llama-3.3-70b-versatile",
+        },
+        "turns": [
+            "What is the total revenue by country?",
+            "Which artists sell the most tracks?",
+            "Analyze how the two results relate.",
+        ],
+    },
+}
+
+
+async def run_thread(client, graph_id: str, script: dict) -> list[dict]:
+    """Play the script of `graph_id` on a fresh thread, one measurement per turn."""
+    samples = []
+    try:
+        thread = await client.threads.create()
+    except Exception as error:
+        return [{"error": f"thread create: {error}"}]
+
+    for turn in script["turns"]:
+        start = time.perf_counter()
+        first_event = None
+        error = None
+        try:
+            async for chunk in client.runs.stream(
+                thread["thread_id"],
+                graph_id,
+                input={"messages": [{"role": "human", "content": turn}]},
+                context=script["context"],
+                stream_mode="updates",
+            ):
+                if chunk.event == "metadata":
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                if chunk.event == "error":
+                    error = str(chunk.data)
+        except Exception as exc:
+            error = str(exc)
+        samples.append(
+            {
+                "time_to_first_event": first_event,
+                "time_to_completion": time.perf_counter() - start,
+                "error": error,
+            }
+        )
+        if error:
+            break
+    return samples
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+async def run_level(client, graph_id: str, concurrency: int) -> dict:
+    """Run the graph's script in `concurrency` threads at once and summarize their turns."""
+    script = SCRIPTS[graph_id]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_thread(client, graph_id, script) for _ in range(concurrency)))
+    wall_time = time.perf_counter() - start
+
+    samples = [sample for thread_samples in results for sample in thread_samples]
+    ok = [sample for sample in samples if not sample["error"]]
+    expected_turns = concurrency * len(script["turns"])
+    return {
+        "concurrency": concurrency,
+        "turns": len(samples),
+        "errors": expected_turns - len(ok),
+        "error_rate": (expected_turns - len(ok)) / expected_turns,
+        "throughput": len(ok) / wall_time,
+        "wall_time": wall_time,
+        "time_to_first_event": _percentiles(
+            [sample["time_to_first_event"] for sample in ok if sample["time_to_first_event"] is not None]
+        ),
+        "time_to_completion": _percentiles([sample["time_to_completion"] for sample in ok]),
+        "error_samples": sorted({sample["error"] for sample in samples if sample["error"]})[:5],
+    }
+
+
+async def run(url: str, graph_ids: list[str], levels: list[int]) -> dict:
+    """Load test every graph at every concurrency level, one level at a time."""
+    client = get_client(url=url)
+    report: dict = {
+        "commit": git_commit(),
+        "created_at": datetime.now(UTC).isoformat(),
+        "url": url,
+        "graphs": {},
+    }
+    for graph_id in graph_ids:
+        report["graphs"][graph_id] = []
+        for concurrency in levels:
+            level = await run_level(client, graph_id, concurrency)
+            report["graphs"][graph_id].append(level)
+            print(format_level(graph_id, level))  # noqa: T201
+    return report
+
+
+def _ms(value: float | None) -> str:
+    return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+
+def format_level(graph_id: str, level: dict) -> str:
+    """Return the one line summary of a concurrency level."""
+    return (
+        f"{graph_id:<24} N={level['concurrency']:<4} "
+        f"{level['throughput']:6.2f} turns/s  "
+        f"ttfe p50/p95 {_ms(level['time_to_first_event']['p50'])}/{_ms(level['time_to_first_event']['p95'])} ms  "
+        f"done p50/p95 {_ms(level['time_to_completion']['p50'])}/{_ms(level['time_to_completion']['p95'])} ms  "
+        f"errors {level['error_rate']:.1%}"
+    )
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    """Per graph and concurrency level changes of throughput and p95 completion time."""
+    lines = [f"Comparing {report.get('commit')} against {baseline.get('commit')}"]
+    for graph_id, levels in report["graphs"].items():
+        baseline_levels = {level["concurrency"]: level for level in baseline["graphs"].get(graph_id, [])}
+        for level in levels:
+            before = baseline_levels.get(level["concurrency"])
+            if not before:
+                continue
+            p95, p95_before = level["time_to_completion"]["p95"], before["time_to_completion"]["p95"]
+            p95_change = f"{(p95 / p95_before - 1):+.1%}" if p95 and p95_before else "-"
+            throughput_change = (
+                f"{(level['throughput'] / before['throughput'] - 1):+.1%}" if before["throughput"] else "-"
+            )
+            lines.append(
+                f"{graph_id:<24} N={level['concurrency']:<4} throughput {throughput_change:>7}  "
+                f"p95 completion {p95_change:>7}  "
+                f"error rate {before['error_rate']:.1%} -> {level['error_rate']:.1%}"
+            )
+    return lines
+
+
+def main() -> None:
+    """Run the load test against the server and report, save or compare the results."""
+    registered = list(json.loads((ROOT / "langgraph.json").read_text())["graphs"])
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8123")
+    parser.add_argument("--graphs", default=",".join(registered), help="Comma separated graph ids")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma separated concurrency levels")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    parser.add_argument("--compare", type=Path, help="JSON report to compare against")
+    args = parser.parse_args()
+
+    graph_ids = [graph_id for graph_id in args.graphs.split(",") if graph_id]
+    unknown = set(graph_ids) - set(SCRIPTS)
+    if unknown:
+        parser.error(f"No script for graphs: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    report = asyncio.run(run(args.url, graph_ids, levels))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        print("\n".join(compare(report, json.loads(args.compare.read_text()))))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Cold-start benchmark of the graphs registered in `langgraph.json`.
+
+Every graph module is imported in a fresh interpreter, the way an API server worker loads
+it, and the wall time of the import, the part of it spent compiling graphs and the heavy
+integrations already loaded by then are reported:
+
+    python -m perf.startup --repeat 5 --output startup.json
+
+Pass `--compare baseline.json` to diff against a report from another commit.
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from perf import ROOT, git_commit
+
+# Integrations the graphs should only load once a node needs them
+HEAVY_MODULES = [
+    "langchain_community.document_loaders",
+    "langchain_community.tools",
+    "langchain_community.agent_toolkits",
+    "langchain_tavily",
+    "langchain_openai",
+    "langchain_groq",
+    "deepagents",
+    "langchain_mcp_adapters",
+    "langgraph.store.postgres",
+    "wikipedia",
+]
+
+
+def measure(path: str) -> dict:
+    """Import the graph module at `path` and time it, run in the child interpreter.
+
+    langgraph itself is imported beforehand, an API server worker has it loaded already.
+    """
+    from langgraph.graph.state import StateGraph
+
+    compile_time = 0.0
+    original_compile = StateGraph.compile
+
+    def timed_compile(self, *args, **kwargs):
+        nonlocal compile_time
+        start = time.perf_counter()
+        try:
+            return original_compile(self, *args, **kwargs)
+        finally:
+            compile_time += time.perf_counter() - start
+
+    StateGraph.compile = timed_compile
+    module_path, _, _ = path.partition(":")
+    spec = importlib.util.spec_from_file_location("graph_module", ROOT / module_path)
+    module = importlib.util.module_from_spec(spec)
+    start = time.perf_counter()
+    spec.loader.exec_module(module)
+    import_time = time.perf_counter() - start
+    return {
+        "import_s": import_time,
+        "compile_s": compile_time,
+        "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def run(graphs: dict[str, str], repeat: int) -> dict:
+    """Import and compile every graph `repeat` times in a fresh interpreter, keeping the medians."""
+    report: dict = {"commit": git_commit(), "repeat": repeat, "graphs": {}}
+    for graph_id, path in graphs.items():
+        samples = []
+        for _ in range(repeat):
+            child = subprocess.run(
+                [sys.executable, "-m", "perf.startup", "--child", path],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+            )
+            if child.returncode:
+                report["graphs"][graph_id] = {"error": child.stderr.strip().splitlines()[-1:]}
+                break
+            samples.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        else:
+            report["graphs"][graph_id] = {
+                "import_s": statistics.median(sample["import_s"] for sample in samples),
+                "compile_s": statistics.median(sample["compile_s"] for sample in samples),
+                "loaded": samples[-1]["loaded"],
+            }
+        print(format_graph(graph_id, report["graphs"][graph_id]))  # noqa: T201
+    return report
+
+
+def format_graph(graph_id: str, result: dict) -> str:
+    """Return the one line summary of a graph's cold start."""
+    if "error" in result:
+        return f"{graph_id:<24} failed: {' '.join(result['error'])}"
+    return (
+        f"{graph_id:<24} import {result['import_s'] * 1000:7.0f} ms  "
+        f"compile {result['compile_s'] * 1000:6.0f} ms  "
+        f"loaded: {', '.join(result['loaded']) or '-'}"
+    )
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    """Per graph change of the import time."""
+    lines = [f"Comparing {report.get('commit')} against {baseline.get('commit')}"]
+    for graph_id, result in report["graphs"].items():
+        before = baseline["graphs"].get(graph_id, {})
+        if "import_s" in result and "import_s" in before:
+            lines.append(
+                f"{graph_id:<24} import {before['import_s'] * 1000:7.0f} -> {result['import_s'] * 1000:7.0f} ms "
+                f"({result['import_s'] / before['import_s'] - 1:+.1%})"
+            )
+    return lines
+
+
+def main() -> None:
+    """Measure the cold start of the graphs and report, save or compare the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", type=Path, default=ROOT / "langgraph.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    parser.add_argument("--compare", type=Path, help="JSON report to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))  # noqa: T201
+        return
+
+    report = run(json.loads(args.config.read_text())["graphs"], args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        print("\n".join(compare(report, json.loads(args.compare.read_text()))))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
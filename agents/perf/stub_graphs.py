@@ -0,0 +1,17 @@
+"""The four agents with models and external tools replaced by the stubs of `perf.stubs`.
+
+Registered by `langgraph.loadtest.json` under the same graph ids as `langgraph.json`, so the
+load generator exercises the real graphs, API server, Redis and Postgres without calling
+Groq, OpenAI, Tavily, Wikipedia or the MCP server.
+"""
+
+from perf.stubs import install
+
+install()
+
+from agent.agent_with_subagents import agent_with_subagents  # noqa: E402
+from agent.coding_assistant import coding_assistant_agent  # noqa: E402
+from agent.simple_agent import simple_agent  # noqa: E402
+from agent.tools_mcp_agent import tools_mcp_agent  # noqa: E402
+
+__all__ = ["agent_with_subagents", "coding_assistant_agent", "simple_agent", "tools_mcp_agent"]
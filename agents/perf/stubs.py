@@ -0,0 +1,209 @@
+"""Latency-injecting stubs for the models and external tools of the four agents.
+
+Latencies are configured with `STUB_MODEL_LATENCY` and `STUB_TOOL_LATENCY` (seconds, +/-
+`STUB_JITTER` as a fraction). `install` patches them in where the agent modules import the
+real ones from, and has to run before the agent modules are imported.
+
+On the turns listed in `STUB_TOOL_TURNS` (1-based, counted by the answers the model has
+given so far) a stub model with tools bound first answers with a round of tool calls, so the
+tool nodes, the shell and SQL tools and the subagent `task` dispatch are exercised too. A
+subagent starts from a single message, so it always makes one round of tool calls.
+"""
+
+import asyncio
+import os
+import random
+import time
+import typing
+import uuid
+from enum import Enum
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+MODEL_LATENCY = float(os.environ.get("STUB_MODEL_LATENCY", "0.5"))
+TOOL_LATENCY = float(os.environ.get("STUB_TOOL_LATENCY", "0.3"))
+JITTER = float(os.environ.get("STUB_JITTER", "0.25"))
+TOOL_TURNS = {int(turn) for turn in os.environ.get("STUB_TOOL_TURNS", "1,3").split(",") if turn}
+
+# Tool calls made when a tool of that name is bound, the first bound tool in this order wins
+TOOL_CALLS: dict[str, list[dict]] = {
+    "task": [
+        {"description": "Total revenue by country from the Invoice table.", "subagent_type": "sql-agent"},
+        {"description": "Analyze the revenue distribution across countries.", "subagent_type": "analyst-agent"},
+    ],
+    "sql_db_query": [
+        {"query": "SELECT BillingCountry, SUM(Total) FROM Invoice GROUP BY BillingCountry ORDER BY 2 DESC"},
+    ],
+    "terminal": [{"commands": "ls"}],
+    "multiply": [{"a": 6, "b": 7}],
+    "ls": [{"path": "/"}],
+}
+
+
+def _delay(latency: float) -> float:
+    return max(0.0, random.uniform(latency * (1 - JITTER), latency * (1 + JITTER)))
+
+
+def _stub_value(annotation: Any) -> Any:
+    options = [arg for arg in typing.get_args(annotation) if arg is not type(None)] or [annotation]
+    annotation = options[0]
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        # The last member is the "do more work" option of the routing enums, e.g. NEEDS_NEW_SEARCH
+        return list(annotation)[-1]
+    if annotation is str:
+        return "stub"
+    if annotation in (int, float):
+        return annotation(0)
+    if annotation is bool:
+        return False
+    return None
+
+
+def _stub_structured_output(schema: Any) -> Any:
+    values = {name: _stub_value(field.annotation) for name, field in schema.model_fields.items()}
+    return schema.model_construct(**values)
+
+
+def _tool_calls(tools: dict[str, str], messages: list) -> list[dict]:
+    """Scripted tool calls for a request, made once per turn listed in `TOOL_TURNS`."""
+    answers = [index for index, message in enumerate(messages) if isinstance(message, AIMessage) and not message.tool_calls]
+    current_turn = messages[answers[-1] + 1 :] if answers else messages
+    # The tools of this turn have run already, answer
+    if any(isinstance(message, ToolMessage) for message in current_turn):
+        return []
+    name = next((name for name in TOOL_CALLS if name in tools), None)
+    if len(answers) + 1 not in TOOL_TURNS or name is None:
+        return []
+    # Only delegate to the subagents the task tool describes
+    calls = [args for args in TOOL_CALLS[name] if "subagent_type" not in args or args["subagent_type"] in tools[name]]
+    if name == "task" and not calls:
+        calls = [{"description": "Give an overview of the project.", "subagent_type": "general-purpose"}]
+    return [{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"} for args in calls]
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model answering after `latency` seconds, with scripted tool calls when tools are bound."""
+
+    model_name: str = "stub"
+    latency: float = MODEL_LATENCY
+    reply: str = "This is a stub reply."
+    # Name and description of the bound tools
+    tools: dict[str, str] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _result(self, messages: list | None = None) -> ChatResult:
+        message = AIMessage(
+            content=self.reply,
+            tool_calls=_tool_calls(self.tools, messages or []),
+            usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(_delay(self.latency))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(_delay(self.latency))
+        return self._result(messages)
+
+    def bind_tools(self, tools, **kwargs):
+        """Return a copy of the model which knows the names and descriptions of `tools`."""
+        functions = [convert_to_openai_tool(tool)["function"] for tool in tools]
+        return self.model_copy(
+            update={"tools": {function["name"]: function.get("description", "") for function in functions}}
+        )
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        """Return a runnable producing a stub instance of `schema`."""
+        def output():
+            parsed = _stub_structured_output(schema)
+            if include_raw:
+                return {"raw": self._result().generations[0].message, "parsed": parsed, "parsing_error": None}
+            return parsed
+
+        def invoke(_input):
+            time.sleep(_delay(self.latency))
+            return output()
+
+        async def ainvoke(_input):
+            await asyncio.sleep(_delay(self.latency))
+            return output()
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def stub_init_chat_model(*args, **kwargs) -> StubChatModel:
+    """Stand-in for `init_chat_model`, whatever the model asked for."""
+    return StubChatModel()
+
+
+class StubTavilySearch:
+    """Tavily search returning a single stub page."""
+
+    def __init__(self, *args, **kwargs):
+        """Accept and ignore the arguments of `TavilySearch`."""
+
+    def invoke(self, query):
+        """Return the stub page for `query` after `TOOL_LATENCY` seconds."""
+        time.sleep(_delay(TOOL_LATENCY))
+        return {"results": [{"url": "https://example.com/stub", "raw_content": f"Stub web content about {query}."}]}
+
+
+class StubWikipediaLoader:
+    """Wikipedia loader returning stub articles with the requested sections."""
+
+    def __init__(self, query, load_max_docs=2, sections=None, **kwargs):
+        """Load `load_max_docs` stub articles about `query`, with `sections` besides the summary."""
+        self.query = query
+        self.load_max_docs = load_max_docs
+        self.sections = sections or []
+
+    def load(self) -> list[Document]:
+        """Return the stub articles after `TOOL_LATENCY` seconds."""
+        time.sleep(_delay(TOOL_LATENCY))
+        return [
+            Document(page_content=f"Stub {section} of article {i} about {self.query}.", metadata={"source": "stub"})
+            for i in range(self.load_max_docs)
+            for section in ["summary", *self.sections]
+        ]
+
+
+class StubMultiServerMCPClient:
+    """MCP client of a server without tools."""
+
+    def __init__(self, *args, **kwargs):
+        """Accept and ignore the server connections."""
+
+    async def get_tools(self) -> list:
+        """Return no tools."""
+        return []
+
+
+def install() -> None:
+    """Patch the stubs in where the agent modules import them from."""
+    import langchain.chat_models
+    import langchain_mcp_adapters.client
+    import langchain_openai
+    import langchain_tavily
+
+    import agent.wiki_loader
+    from agent.scheduler import scheduler
+
+    langchain.chat_models.init_chat_model = stub_init_chat_model
+    langchain_openai.ChatOpenAI = lambda *args, **kwargs: StubChatModel()
+    langchain_tavily.TavilySearch = StubTavilySearch
+    agent.wiki_loader.ProgressiveWikipediaLoader = StubWikipediaLoader
+    langchain_mcp_adapters.client.MultiServerMCPClient = StubMultiServerMCPClient
+    # Measure the server rather than the client-side Groq budgets
+    scheduler.model_limits = {}
+
@@ -1,8 +1 @@
-"""New LangGraph Agent.
-
-This module defines a custom graph.
-"""
-
-from agent.graph import graph
-
-__all__ = ["graph"]
+"""LangGraph agents registered in langgraph.json."""
@@ -1,19 +1,35 @@
 import asyncio
 import os
+import threading
 from dataclasses import dataclass
-from typing import Awaitable, Callable
+from typing import Any, Awaitable, Callable, Iterable, cast
 
 from deepagents import CompiledSubAgent, create_deep_agent
 from deepagents.backends import CompositeBackend, FilesystemBackend, StoreBackend
 from langchain.agents import create_agent
-from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    ModelRequest,
+    ModelResponse,
+    ToolCallRequest,
+)
 from langchain.chat_models import init_chat_model
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.prompt import QUERY_CHECKER
 from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.store.postgres import PostgresStore
-from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from langchain_core.messages import ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.tools import BaseTool
+from langgraph.store.base import BaseStore, Op, Result
+from langgraph.types import Command
+from sqlalchemy import Engine, create_engine
+
+from agent.dispatch import subagent_dispatcher
+from agent.hedging import ahedge
+from agent.mcp_discovery import ToolDiscovery
+from agent.prompts import prompt_cache_stats, static_prompt
+from agent.query_log import query_log
+from agent.scheduler import scheduler
 
 
 @dataclass
@@ -22,9 +38,14 @@ class ContextSchema:
     main_model: str
     sql_model: str
     analyst_model: str
+    # Secondary model raced against the role's model when it hasn't answered within `hedge_delay` seconds
+    hedge_model: str | None = None
+    hedge_delay: float = 2.0
 
 
-async def get_aws_docs_mcp_tools() -> list:
+async def get_aws_docs_mcp_tools() -> list[BaseTool]:
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
     client = MultiServerMCPClient(
         {
             "awslabs.aws-documentation-mcp-server": {
@@ -43,30 +64,96 @@ async def get_aws_docs_mcp_tools() -> list:
     return await client.get_tools()
 
 
-def get_engine_for_chinook_db():
+# Discovered by the main agent's first model call, which adds the tools to its requests
+mcp_tools = ToolDiscovery(get_aws_docs_mcp_tools)
+
+
+def get_engine_for_chinook_db() -> Engine:
+    # Read-only connections from a pool, so concurrent SQL tasks each query on their own connection
     return create_engine(
-        "sqlite:///./Chinook_Sqlite.sqlite",
-        poolclass=StaticPool,
+        "sqlite:///file:Chinook_Sqlite.sqlite?mode=ro&uri=true",
         connect_args={"check_same_thread": False},
     )
 
 
+class LoggedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose queries are recorded by the query log, timed with fetching their rows."""
+
+    def run(self, *args: Any, **kwargs: Any) -> Any:
+        """Run the query, recording it in the query log."""
+        with query_log.measure():
+            return super().run(*args, **kwargs)
+
+
 engine = get_engine_for_chinook_db()
-db = SQLDatabase(engine)
+query_log.attach(engine)
+# Tables are reflected when a tool first needs them rather than at import
+db = LoggedSQLDatabase(engine, lazy_table_reflection=True)
 # The model is used for the QuerySQLCheckerTool tool of the toolkit and it's difficult to override it in the middleware
-sql_model = init_chat_model(model_provider="groq", model="openai/gpt-oss-120b", streaming=False)
+sql_checker_model_name = "openai/gpt-oss-120b"
+sql_model = init_chat_model(model_provider="groq", model=sql_checker_model_name, streaming=False)
 toolkit = SQLDatabaseToolkit(db=db, llm=sql_model)
 
 initial_default_model = init_chat_model(model_provider="groq", model="llama-3.1-8b-instant", streaming=False)
 
 
-mcp_servers = asyncio.run(get_aws_docs_mcp_tools())
+class LazyPostgresStore(BaseStore):
+    """PostgresStore which connects and sets up its tables on first use instead of at import."""
+
+    def __init__(self, conn_string: str):
+        """Connect to `conn_string` once the store is first used."""
+        self.conn_string = conn_string
+        self._store: BaseStore | None = None
+        self._lock = threading.Lock()
+
+    def _get_store(self) -> BaseStore:
+        with self._lock:
+            if self._store is None:
+                from langgraph.store.postgres import PostgresStore
+
+                # Use PostgresStore.from_conn_string as a context manager
+                store = PostgresStore.from_conn_string(self.conn_string).__enter__()
+                store.setup()
+                self._store = store
+            return self._store
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        """Run `ops` on the Postgres store."""
+        return self._get_store().batch(ops)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        """Run `ops` on the Postgres store, connecting in a worker thread."""
+        store = await asyncio.to_thread(self._get_store)
+        return await store.abatch(ops)
+
 
+store = LazyPostgresStore(os.environ["POSTGRES_URI"])
 
-# Use PostgresStore.from_conn_string as a context manager
-store_ctx = PostgresStore.from_conn_string(os.environ["POSTGRES_URI"])
-store = store_ctx.__enter__()
-store.setup()
+
+async def hedged_model_call(
+    request: ModelRequest,
+    handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    model_name: str,
+    agent_name: str,
+) -> ModelResponse:
+    """Call `model_name` with the user's key, hedged with the context's `hedge_model` if it has one."""
+    context = cast(ContextSchema, request.runtime.context)
+
+    tokens = count_tokens_approximately(request.messages)
+
+    # The hedge delay starts once the primary has left the scheduler's queue
+    admitted = asyncio.Event()
+
+    def call(name: str, on_admitted: Callable[[], None] | None = None) -> Callable[[], Awaitable[ModelResponse]]:
+        model = init_chat_model(model_provider="groq", model=name, api_key=context.token, streaming=False)
+        return lambda: scheduler.arun(
+            context.token, name, lambda: handler(request.override(model=model)), tokens=tokens, on_admitted=on_admitted
+        )
+
+    secondary = call(context.hedge_model) if context.hedge_model else None
+    response = await ahedge(call(model_name, admitted.set), secondary, context.hedge_delay, admitted=admitted)
+    prompt_cache_stats.record(agent_name, response)
+    return response
 
 
 # This is connectivity test for the sql-agent agent to which you have access, please invoke it with a random message.
@@ -77,26 +164,33 @@ class SqlSubagentMiddleware(AgentMiddleware):
         request: ModelRequest,
         handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
     ) -> ModelResponse:
-        sql_model = init_chat_model(
-            model_provider="groq",
-            model=request.runtime.context.sql_model,
-            api_key=request.runtime.context.token,
-            streaming=False
-        )
-        new_request = request.override(model=sql_model)
+        return await hedged_model_call(request, handler, request.runtime.context.sql_model, "sql-agent")
 
-        return await handler(new_request)
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command[Any]]],
+    ) -> ToolMessage | Command[Any]:
+        """Budget the query checker's Groq call like the other calls, it uses the toolkit's model and the server's key."""
+        if request.tool_call["name"] != "sql_db_query_checker":
+            return await handler(request)
+        return await scheduler.arun(
+            None,
+            sql_checker_model_name,
+            lambda: handler(request),
+            tokens=count_tokens_approximately([QUERY_CHECKER, str(request.tool_call["args"])]),
+        )
 
 
 sql_subagent = create_agent(
     # Default model which will be overridden by the middleware
     model=initial_default_model,
     name="sql-agent",
-    system_prompt="""
+    system_prompt=static_prompt("""
         You are a SQL agent that can execute queries against the company's database. Run queries to retrieve
         information from the database. The company database is a SQLite database so you must use the SQLite syntax
         when writing queries.
-    """,
+    """),
     middleware=[SqlSubagentMiddleware()],
     tools=toolkit.get_tools(),
 )
@@ -114,25 +208,17 @@ class AnalystSubagentMiddleware(AgentMiddleware):
         request: ModelRequest,
         handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
     ) -> ModelResponse:
-        analyst_model = init_chat_model(
-            model_provider="groq",
-            model=request.runtime.context.analyst_model,
-            api_key=request.runtime.context.token,
-            streaming=False
-        )
-        new_request = request.override(model=analyst_model)
-
-        return await handler(new_request)
+        return await hedged_model_call(request, handler, request.runtime.context.analyst_model, "analyst-agent")
 
 
 analyst_subagent = create_agent(
     # Default model which will be overridden by the middleware
     model=initial_default_model,
     name="analyst-agent",
-    system_prompt="""
+    system_prompt=static_prompt("""
         You are an analyst agent that can analyze data from the company's database.
         You will be given a data to analyze.
-    """,
+    """),
     middleware=[AnalystSubagentMiddleware()],
 )
 compiled_analyst_subagent = CompiledSubAgent(
@@ -148,15 +234,28 @@ class MainAgentMiddleware(AgentMiddleware):
         request: ModelRequest,
         handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
     ) -> ModelResponse:
-        main_model = init_chat_model(
-            model_provider="groq",
-            model=request.runtime.context.main_model,
-            api_key=request.runtime.context.token,
-            streaming=False
-        )
-        new_request = request.override(model=main_model)
+        request = request.override(tools=[*request.tools, *await mcp_tools.get()])
+        return await hedged_model_call(request, handler, request.runtime.context.main_model, "agent-with-subagents")
 
-        return await handler(new_request)
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command[Any]]],
+    ) -> ToolMessage | Command[Any]:
+        """Run subagent tasks through the dispatcher, which caps the tasks running per subagent."""
+        # The MCP tools aren't registered with the agent, hand them to the tool node with the call
+        if request.tool is None:
+            tools = {tool.name: tool for tool in await mcp_tools.get()}
+            if request.tool_call["name"] in tools:
+                return await handler(request.override(tool=tools[request.tool_call["name"]]))
+        # Subagent tasks of one turn run concurrently, capped per subagent by the dispatcher
+        if request.tool_call["name"] != "task":
+            return await handler(request)
+        return await subagent_dispatcher.run(
+            request.tool_call["args"].get("subagent_type", "general-purpose"),
+            lambda: handler(request),
+            request.tool_call["id"],
+        )
 
 
 agent_with_subagents = create_deep_agent(
@@ -164,7 +263,8 @@ agent_with_subagents = create_deep_agent(
     system_prompt=(
         "You are a helpful assistant helping the company employees with their tasks. Your role is to "
         "orchestrate the subagents you have access to. With their help, you can accomplish complex tasks and answer "
-        "the user's questions."
+        "the user's questions. When a request needs several independent lookups or analyses, delegate all of "
+        "them in the same turn, the subagent tasks then run concurrently."
     ),
     subagents=[compiled_sql_subagent, compiled_analyst_subagent],
     context_schema=ContextSchema,
@@ -177,5 +277,4 @@ agent_with_subagents = create_deep_agent(
             # "/home": FilesystemBackend()
         }
     ),
-    tools=mcp_servers
 )
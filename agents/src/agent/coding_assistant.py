@@ -7,6 +7,8 @@ from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResp
 from langchain.chat_models import init_chat_model
 from pydantic import BaseModel, Field
 
+from agent.prompts import prompt_cache_stats
+
 
 @dataclass
 class ContextSchema:
@@ -74,7 +76,10 @@ class MainAgentMiddleware(AgentMiddleware):
         )
         new_request = request.override(model=main_model)
 
-        return await handler(new_request)
+        response = await handler(new_request)
+        prompt_cache_stats.record("coding-assistant-agent", response)
+
+        return response
 
 
 coding_assistant_agent = create_deep_agent(
@@ -0,0 +1,158 @@
+"""Concurrent dispatch of subagent tasks.
+
+The tool calls of one orchestrator turn already run together: the agent's tool node starts
+every call of an AI message at once and adds the results in the order of the calls. What
+`SubagentDispatcher` adds is a cap on the tasks running at a time per subagent, so a burst
+of delegations can't overload the SQLite database or the model provider, and a timing of
+every task, split into the wait for a slot and the run itself.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class TaskTiming:
+    """Wait for a slot and run time of a finished subagent task."""
+
+    subagent: str
+    task_id: str | None
+    started_at: float
+    wait_s: float
+    duration_s: float
+    ok: bool
+
+
+@dataclass
+class _Slots:
+    limit: int
+    in_flight: int = 0
+    peak: int = 0
+    # Waiting tasks in arrival order, with the event loop to wake each of them on
+    waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = field(default_factory=deque)
+
+
+def _wake(waiter: asyncio.Future[None]) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SubagentDispatcher:
+    """Per-subagent concurrency caps and timings for subagent tasks.
+
+    Tasks waiting for a slot are served first come, first served. Slots are shared between
+    event loops and threads, a freed slot is handed straight to the next waiting task.
+    """
+
+    def __init__(self, limits: dict[str, int] | None = None, default_limit: int = 2, history: int = 256):
+        """Cap subagents at their entry of `limits`, others at `default_limit`, keeping `history` timings."""
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self._slots: dict[str, _Slots] = {}
+        self._timings: deque[TaskTiming] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def limit(self, subagent: str) -> int:
+        """Return the number of tasks of `subagent` allowed to run at a time."""
+        return self.limits.get(subagent, self.default_limit)
+
+    def _get_slots(self, subagent: str) -> _Slots:
+        slots = self._slots.get(subagent)
+        if slots is None:
+            slots = self._slots[subagent] = _Slots(limit=self.limit(subagent))
+        return slots
+
+    async def _acquire(self, subagent: str) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._get_slots(subagent)
+            if slots.in_flight < slots.limit and not slots.waiters:
+                slots.in_flight += 1
+                slots.peak = max(slots.peak, slots.in_flight)
+                return
+            waiter = loop.create_future()
+            slots.waiters.append((loop, waiter))
+        try:
+            await waiter
+        except BaseException:
+            with self._lock:
+                handed_over = (loop, waiter) not in slots.waiters
+                if not handed_over:
+                    slots.waiters.remove((loop, waiter))
+            # Cancelled after the slot was handed over, pass it on
+            if handed_over:
+                self._release(subagent)
+            raise
+
+    def _release(self, subagent: str, timing: TaskTiming | None = None) -> None:
+        with self._lock:
+            slots = self._slots[subagent]
+            if timing is not None:
+                self._timings.append(timing)
+            if slots.waiters:
+                # The slot goes to the next task in line, in_flight stays the same
+                loop, waiter = slots.waiters.popleft()
+                loop.call_soon_threadsafe(_wake, waiter)
+            else:
+                slots.in_flight -= 1
+
+    async def run(self, subagent: str, call: Callable[[], Awaitable[T]], task_id: str | None = None) -> T:
+        """Run the task `call` of `subagent` once the subagent has a free slot."""
+        queued_at = time.perf_counter()
+        await self._acquire(subagent)
+        started, started_at = time.perf_counter(), time.time()
+
+        ok = False
+        try:
+            result = await call()
+            ok = True
+            return result
+        finally:
+            self._release(
+                subagent,
+                TaskTiming(
+                    subagent=subagent,
+                    task_id=task_id,
+                    started_at=started_at,
+                    wait_s=started - queued_at,
+                    duration_s=time.perf_counter() - started,
+                    ok=ok,
+                ),
+            )
+
+    def timings(self) -> list[TaskTiming]:
+        """Return the most recent finished tasks, oldest first."""
+        with self._lock:
+            return list(self._timings)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Return in-flight, queued and peak tasks plus wait and run times per subagent."""
+        with self._lock:
+            timings = list(self._timings)
+            report = {}
+            for subagent, slots in sorted(self._slots.items()):
+                finished = [timing for timing in timings if timing.subagent == subagent]
+                durations = [timing.duration_s for timing in finished]
+                report[subagent] = {
+                    "limit": slots.limit,
+                    "in_flight": slots.in_flight,
+                    "queued": len(slots.waiters),
+                    "peak_in_flight": slots.peak,
+                    "tasks": len(finished),
+                    "failures": sum(not timing.ok for timing in finished),
+                    "mean_wait_s": statistics.fmean(timing.wait_s for timing in finished) if finished else 0.0,
+                    "mean_duration_s": statistics.fmean(durations) if durations else 0.0,
+                    "max_duration_s": max(durations, default=0.0),
+                }
+            return report
+
+
+# SQL tasks each query on their own read-only connection, the cap bounds their Groq calls
+subagent_dispatcher = SubagentDispatcher({"sql-agent": 2, "analyst-agent": 3})
@@ -0,0 +1,175 @@
+"""Hedged model requests.
+
+A hedged request is sent to a primary model first. If the primary has not answered within
+`delay` seconds, the same request is sent to a secondary model and whichever completes first
+wins, the other one is cancelled. If the primary fails (errors, rate limits) the secondary is
+started straight away as a fallback. A primary which first waits in a queue, e.g. for its
+rate limit budget, reports when it is admitted and the delay only starts then, so requests
+aren't duplicated exactly when the budget is used up.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgeStats:
+    """Counters used to trade tail latency against the cost of duplicated requests."""
+
+    requests: int = 0
+    # Secondary started because the primary was slower than the hedge delay
+    hedged: int = 0
+    # Secondary started because the primary failed
+    fallbacks: int = 0
+    secondary_wins: int = 0
+    failures: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, **increments: int) -> None:
+        """Add `increments` to the counters of the same names."""
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def hedge_rate(self) -> float:
+        """Share of requests for which a second model call was made."""
+        return (self.hedged + self.fallbacks) / self.requests if self.requests else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """Share of second model calls that produced the returned response."""
+        launched = self.hedged + self.fallbacks
+        return self.secondary_wins / launched if launched else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the counters together with the hedge and win rates."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "fallbacks": self.fallbacks,
+                "secondary_wins": self.secondary_wins,
+                "failures": self.failures,
+                "hedge_rate": self.hedge_rate,
+                "win_rate": self.win_rate,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+def hedge(
+    primary: Callable[[], T],
+    secondary: Callable[[], T] | None,
+    delay: float,
+    stats: HedgeStats | None = None,
+    admitted: threading.Event | None = None,
+    cancelled: threading.Event | None = None,
+) -> T:
+    """Run `primary` and hedge it with `secondary` after `delay` seconds.
+
+    If `admitted` is given the delay starts once the primary sets it. Threads can't be
+    interrupted, so the losing call is abandoned rather than stopped and its result is
+    discarded, `cancelled` is set for a primary still waiting to be admitted to drop out.
+    Both calls run in a copy of the caller's context, keeping the LangGraph config
+    (callbacks, tracing, streaming) of the calling node.
+    """
+    stats = stats or hedge_stats
+    stats.record(requests=1)
+    if secondary is None:
+        return primary()
+
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+    try:
+        primary_future = executor.submit(contextvars.copy_context().run, primary)
+        if admitted is not None:
+            # A primary failing before it is admitted counts as admitted
+            primary_future.add_done_callback(lambda _: admitted.set())
+            admitted.wait()
+        done, _ = wait([primary_future], timeout=delay)
+        if done and primary_future.exception() is None:
+            return primary_future.result()
+
+        stats.record(**({"fallbacks": 1} if done else {"hedged": 1}))
+        secondary_future = executor.submit(contextvars.copy_context().run, secondary)
+        errors: list[BaseException] = []
+        pending: set[Future[T]] = {secondary_future}
+        if done:
+            errors.append(primary_future.exception())  # type: ignore[arg-type]
+        else:
+            pending.add(primary_future)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary_future:
+                        stats.record(secondary_wins=1)
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                errors.append(future.exception())  # type: ignore[arg-type]
+
+        stats.record(failures=1)
+        raise errors[0]
+    finally:
+        if cancelled is not None:
+            cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def ahedge(
+    primary: Callable[[], Awaitable[T]],
+    secondary: Callable[[], Awaitable[T]] | None,
+    delay: float,
+    stats: HedgeStats | None = None,
+    admitted: asyncio.Event | None = None,
+) -> T:
+    """Async version of `hedge`, the losing call is cancelled."""
+    stats = stats or hedge_stats
+    stats.record(requests=1)
+    if secondary is None:
+        return await primary()
+
+    primary_task = asyncio.ensure_future(primary())
+    tasks = [primary_task]
+    try:
+        if admitted is not None:
+            primary_task.add_done_callback(lambda _: admitted.set())
+            await admitted.wait()
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done and primary_task.exception() is None:
+            return primary_task.result()
+
+        stats.record(**({"fallbacks": 1} if done else {"hedged": 1}))
+        secondary_task = asyncio.ensure_future(secondary())
+        tasks.append(secondary_task)
+        errors: list[BaseException] = []
+        pending: set[asyncio.Future[T]] = {secondary_task}
+        if done:
+            errors.append(primary_task.exception())  # type: ignore[arg-type]
+        else:
+            pending.add(primary_task)
+
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                if task.exception() is None:
+                    if task is secondary_task:
+                        stats.record(secondary_wins=1)
+                    return task.result()
+                errors.append(task.exception())  # type: ignore[arg-type]
+
+        stats.record(failures=1)
+        raise errors[0]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
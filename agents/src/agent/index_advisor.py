@@ -0,0 +1,300 @@
+"""Index advisor for the queries the sql-agent runs against the Chinook database.
+
+Reads the queries captured by `agent.query_log` (with their `EXPLAIN QUERY PLAN`), finds
+repeated full table scans and temporary B-trees, proposes covering indexes and precomputed
+summary tables, applies them to a working copy of the database and measures per-query
+speedups:
+
+    python -m agent.index_advisor --log sql_queries.jsonl --db Chinook_Sqlite.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import statistics
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from agent.query_log import QueryRecord, explain_query_plan, normalize
+
+# Covering indexes wider than this cost more to maintain than they save on a scan
+MAX_INDEX_COLUMNS = 5
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_TABLE_REFERENCE = re.compile(
+    r"\b(?:FROM|JOIN)\s+[\[\"`]?(\w+)[\]\"`]?(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|INNER|LEFT|RIGHT|CROSS|"
+    r"NATURAL|GROUP|ORDER|LIMIT|USING|HAVING|UNION)\b)(\w+))?",
+    re.IGNORECASE,
+)
+_PREDICATE_CLAUSE = re.compile(
+    r"\b(ON|WHERE|GROUP\s+BY|ORDER\s+BY|HAVING)\b(.*?)"
+    r"(?=\b(?:JOIN|INNER|LEFT|RIGHT|CROSS|WHERE|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION)\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+_TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+
+
+@dataclass
+class Suggestion:
+    """An index or summary table to create, with the queries it is for."""
+
+    kind: str  # "index" or "summary_table"
+    name: str
+    sql: str
+    reason: str
+    queries: list[str]
+
+
+def read_log(path: Path) -> list[QueryRecord]:
+    """Read the query records of a JSONL query log."""
+    with path.open() as log:
+        return [QueryRecord(**json.loads(line)) for line in log if line.strip()]
+
+
+def _table_aliases(sql: str) -> dict[str, str]:
+    aliases = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def _column_references(sql: str, aliases: dict[str, str], columns: dict[str, list[str]]) -> list[tuple[str, str]]:
+    """(table, column) pairs referenced in `sql`, in order of appearance."""
+    references = []
+    tables = set(aliases.values())
+    for match in re.finditer(r"(?:(\w+)\.)?(\w+)", sql):
+        qualifier, name = match.groups()
+        if qualifier:
+            table = aliases.get(qualifier)
+            if table and name in columns.get(table, []):
+                references.append((table, name))
+        elif not (match.start() and sql[match.start() - 1] == "."):
+            owners = [table for table in tables if name in columns.get(table, [])]
+            if len(owners) == 1:
+                references.append((owners[0], name))
+    return references
+
+
+class IndexAdvisor:
+    """Suggestions for the queries captured against one database, based on its schema."""
+
+    def __init__(self, connection: sqlite3.Connection, min_repeats: int = 2):
+        """Read the tables and indexes of `connection`, suggesting for scans repeated `min_repeats` times."""
+        self.connection = connection
+        self.min_repeats = min_repeats
+        self._columns: dict[str, list[str]] = {}
+        self._indexes: dict[str, list[list[str]]] = {}
+        for (table,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+            self._columns[table] = [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+            self._indexes[table] = [
+                [row[2] for row in connection.execute(f'PRAGMA index_info("{index[1]}")')]
+                for index in connection.execute(f'PRAGMA index_list("{table}")')
+            ]
+
+    def findings(self, records: list[QueryRecord]) -> dict[str, dict[str, int]]:
+        """Full scans and temporary B-trees per table over all captured queries."""
+        scans: Counter[str] = Counter()
+        temp_btrees: Counter[str] = Counter()
+        for record in records:
+            aliases = _table_aliases(record.sql)
+            for detail in record.plan:
+                if match := _FULL_SCAN.match(detail):
+                    table = aliases.get(match.group(1), match.group(1))
+                    if table in self._columns:
+                        scans[table] += 1
+                elif match := _TEMP_BTREE.search(detail):
+                    temp_btrees[match.group(1)] += 1
+        return {"full_scans": dict(scans), "temp_btrees": dict(temp_btrees)}
+
+    def _index_for(self, sql: str, table: str) -> list[str] | None:
+        """Columns of a covering index of `table` for `sql`: predicates first, then the rest."""
+        sql = _STRING_LITERAL.sub("''", sql)
+        aliases = _table_aliases(sql)
+        predicate_columns = [
+            column
+            for _, clause in _PREDICATE_CLAUSE.findall(sql)
+            for owner, column in _column_references(clause, aliases, self._columns)
+            if owner == table
+        ]
+        all_columns = [column for owner, column in _column_references(sql, aliases, self._columns) if owner == table]
+        # SELECT * reads every column, only the predicates can use an index then
+        if re.search(r"SELECT\s+(?:DISTINCT\s+)?\*", sql, re.IGNORECASE):
+            all_columns = []
+        columns = list(dict.fromkeys(predicate_columns + all_columns))
+        if len(columns) > MAX_INDEX_COLUMNS:
+            columns = list(dict.fromkeys(predicate_columns))[:MAX_INDEX_COLUMNS]
+        if not predicate_columns and not all_columns:
+            return None
+        if len(columns) >= len(self._columns[table]):
+            return None
+        if any(existing[: len(columns)] == columns for existing in self._indexes[table]):
+            return None
+        return columns
+
+    def suggest(self, records: list[QueryRecord]) -> list[Suggestion]:
+        """Covering indexes for repeated full scans and summary tables for repeated aggregates."""
+        by_sql: dict[str, list[QueryRecord]] = defaultdict(list)
+        for record in records:
+            by_sql[normalize(record.sql)].append(record)
+
+        scanned: dict[tuple[str, tuple[str, ...]], set[str]] = defaultdict(set)
+        scan_counts: Counter[tuple[str, tuple[str, ...]]] = Counter()
+        suggestions = []
+        for sql, executions in by_sql.items():
+            aliases = _table_aliases(sql)
+            plan = executions[-1].plan
+            for detail in plan:
+                if match := _FULL_SCAN.match(detail):
+                    table = aliases.get(match.group(1), match.group(1))
+                    if table in self._columns and (index_columns := self._index_for(sql, table)):
+                        scanned[(table, tuple(index_columns))].add(sql)
+                        scan_counts[(table, tuple(index_columns))] += len(executions)
+
+            has_temp_btree = any(_TEMP_BTREE.search(detail) for detail in plan)
+            if (
+                len(executions) >= self.min_repeats
+                and has_temp_btree
+                and re.search(r"\bGROUP\s+BY\b", sql, re.IGNORECASE)
+                and not executions[-1].parameters
+            ):
+                name = f"summary_{hashlib.sha256(sql.encode()).hexdigest()[:8]}"
+                suggestions.append(
+                    Suggestion(
+                        kind="summary_table",
+                        name=name,
+                        sql=f'CREATE TABLE "{name}" AS {sql}',
+                        reason=f"aggregate executed {len(executions)} times, each building a temporary B-tree",
+                        queries=[sql],
+                    )
+                )
+
+        # A wider index with the same leading columns serves the narrower one's queries as well
+        for table, columns in sorted(scanned, key=lambda candidate: len(candidate[1])):
+            wider = [
+                other
+                for other_table, other in scanned
+                if other_table == table and len(other) > len(columns) and other[: len(columns)] == columns
+            ]
+            if wider:
+                widest = max(wider, key=len)
+                scanned[(table, widest)] |= scanned.pop((table, columns))
+                scan_counts[(table, widest)] += scan_counts.pop((table, columns))
+
+        for (table, columns), queries in scanned.items():
+            if scan_counts[(table, columns)] < self.min_repeats:
+                continue
+            name = f"idx_advisor_{table}_{'_'.join(columns)}"
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            suggestions.append(
+                Suggestion(
+                    kind="index",
+                    name=name,
+                    sql=f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})',
+                    reason=f"{table} fully scanned {scan_counts[(table, columns)]} times",
+                    queries=sorted(queries),
+                )
+            )
+        return suggestions
+
+
+def create_working_copy(source: Path, target: Path, suggestions: list[Suggestion]) -> sqlite3.Connection:
+    """Copy `source` to `target` and apply the suggestions there, never to the original."""
+    target.unlink(missing_ok=True)
+    copy = sqlite3.connect(target)
+    with sqlite3.connect(source) as original:
+        original.backup(copy)
+    for suggestion in suggestions:
+        copy.execute(suggestion.sql)
+    copy.execute("ANALYZE")
+    copy.commit()
+    return copy
+
+
+def _time(connection: sqlite3.Connection, sql: str, parameters: Any, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(sql, parameters or ()).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(
+    original: sqlite3.Connection,
+    copy: sqlite3.Connection,
+    records: list[QueryRecord],
+    suggestions: list[Suggestion],
+    repeat: int = 5,
+) -> list[dict[str, Any]]:
+    """Median time and plan of every distinct query before and after the suggestions."""
+    summaries = {query: s.name for s in suggestions if s.kind == "summary_table" for query in s.queries}
+    distinct = {normalize(record.sql): record for record in records}
+    results = []
+    for sql, record in distinct.items():
+        rewritten = f'SELECT * FROM "{summaries[sql]}"' if sql in summaries else sql
+        before = _time(original, sql, record.parameters, repeat)
+        after = _time(copy, rewritten, record.parameters if rewritten == sql else None, repeat)
+        results.append(
+            {
+                "sql": sql,
+                "before_ms": before,
+                "after_ms": after,
+                "speedup": before / after if after else None,
+                "plan_before": explain_query_plan(original, sql, record.parameters),
+                "plan_after": explain_query_plan(copy, rewritten, record.parameters if rewritten == sql else None),
+            }
+        )
+    return sorted(results, key=lambda result: result["before_ms"], reverse=True)
+
+
+def format_report(
+    findings: dict[str, dict[str, int]], suggestions: list[Suggestion], results: list[dict[str, Any]]
+) -> str:
+    """Markdown report of the findings, suggestions and per-query timings."""
+    lines = ["# Chinook index advisor", "", "## Findings", ""]
+    lines += [f"- {table}: {count} full scans" for table, count in findings["full_scans"].items()]
+    lines += [f"- temporary B-tree for {usage}: {count}" for usage, count in findings["temp_btrees"].items()]
+    lines += ["", "## Suggestions", ""]
+    lines += [f"- `{suggestion.sql}` ({suggestion.reason})" for suggestion in suggestions] or ["- none"]
+    lines += ["", "## Per-query timings (working copy)", "", "| before ms | after ms | speedup | query |", "|---|---|---|---|"]
+    for result in results:
+        speedup = f"{result['speedup']:.1f}x" if result["speedup"] else "-"
+        lines.append(f"| {result['before_ms']:.2f} | {result['after_ms']:.2f} | {speedup} | `{result['sql'][:120]}` |")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """Run the advisor on a query log and print the report."""
+    parser = argparse.ArgumentParser(description="Propose and measure indexes for captured sql-agent queries.")
+    parser.add_argument("--log", type=Path, required=True, help="JSONL query log written by agent.query_log")
+    parser.add_argument("--db", type=Path, default=Path("Chinook_Sqlite.sqlite"))
+    parser.add_argument("--working-copy", type=Path, default=Path("Chinook_Sqlite.advisor.sqlite"))
+    parser.add_argument("--min-repeats", type=int, default=2)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    records = read_log(args.log)
+    original = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    advisor = IndexAdvisor(original, min_repeats=args.min_repeats)
+    findings = advisor.findings(records)
+    suggestions = advisor.suggest(records)
+    copy = create_working_copy(args.db, args.working_copy, suggestions)
+    results = benchmark(original, copy, records, suggestions)
+
+    if args.json:
+        report = {"findings": findings, "suggestions": [asdict(s) for s in suggestions], "queries": results}
+        print(json.dumps(report, indent=2))  # noqa: T201
+    else:
+        print(format_report(findings, suggestions, results))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Discovery of MCP tools on first use.
+
+Discovering the tools of an MCP server starts the server process, so it is deferred to the
+first model call that needs the tools rather than done at import. Discovery runs in a thread
+of its own and is waited for at most `timeout` seconds. If it fails or times out, the failure
+is logged, callers carry on without the tools and discovery is tried again once
+`retry_interval` seconds have passed, so a single bad start doesn't break every later call.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Coroutine
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+
+class ToolDiscovery:
+    """Tools of an MCP server, discovered when first asked for and retried after failures."""
+
+    def __init__(
+        self,
+        discover: Callable[[], Coroutine[Any, Any, list["BaseTool"]]],
+        timeout: float = 30.0,
+        retry_interval: float = 60.0,
+    ):
+        """Discover the tools with `discover`, waiting up to `timeout` seconds for it."""
+        self.discover = discover
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.failures = 0
+        self._future: Future[list[BaseTool]] | None = None
+        self._retry_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> Future[list["BaseTool"]]:
+        # A loop of its own, the tools don't depend on the event loop of the first caller
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-tools")
+        future = executor.submit(asyncio.run, self.discover())
+        executor.shutdown(wait=False)
+        return future
+
+    async def get(self) -> list["BaseTool"]:
+        """Return the tools, none while discovery is failing."""
+        with self._lock:
+            if self._future is not None and self._future.done() and self._future.exception() is None:
+                return self._future.result()
+            if self._retry_at is not None:
+                if time.monotonic() < self._retry_at:
+                    return []
+                # A discovery that is still hanging is abandoned for a new one
+                self._future, self._retry_at = None, None
+            if self._future is None:
+                self._future = self._start()
+            future = self._future
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except Exception as error:
+            with self._lock:
+                if self._future is future and self._retry_at is None:
+                    self.failures += 1
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    logger.warning("MCP tool discovery failed, continuing without the MCP tools: %r", error)
+            return []
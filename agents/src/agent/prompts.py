@@ -0,0 +1,79 @@
+"""Message assembly that keeps prompt prefixes stable for provider prompt caching.
+
+Providers with automatic prefix caching (OpenAI, Anthropic, Groq) only reuse the part of a
+request that is byte-identical to an earlier one. Messages are therefore laid out as the
+static instructions first, then the conversation history, which only grows, and anything
+that changes from turn to turn (summaries, search contexts) last. The changing part goes into
+a trailing human message rather than a second system message, which providers such as
+Anthropic only accept at the start. Cached input tokens from the responses' usage metadata
+are counted per agent so the savings are visible.
+"""
+
+import inspect
+import threading
+from collections import defaultdict
+from typing import Any, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+
+def static_prompt(text: str) -> str:
+    """Normalize the indentation of a prompt literal so its bytes never depend on the call site."""
+    return inspect.cleandoc(text)
+
+
+def assemble_messages(
+    static: str | None, history: Sequence[BaseMessage], *context: BaseMessage | str | None
+) -> list[BaseMessage]:
+    """Lay out the static system prompt, then the history, then the dynamic context.
+
+    Context strings are joined into one trailing human message, context messages are
+    appended as they are and empty parts are skipped.
+    """
+    messages: list[BaseMessage] = [SystemMessage(content=static)] if static else []
+    messages.extend(history)
+
+    text = "\n\n".join(part for part in context if isinstance(part, str) and part)
+    if text:
+        messages.append(HumanMessage(content=text))
+    messages.extend(part for part in context if isinstance(part, BaseMessage))
+    return messages
+
+
+class PromptCacheStats:
+    """Input and cached input tokens of the model responses, per agent."""
+
+    def __init__(self) -> None:
+        """Start with no agents counted."""
+        self._agents: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "input_tokens": 0, "cached_tokens": 0}
+        )
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, response: Any) -> None:
+        """Count the input and cached tokens of a message or of the last message of a model response."""
+        messages = getattr(response, "result", None)
+        if isinstance(messages, list) and messages:
+            response = messages[-1]
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        with self._lock:
+            counters = self._agents[agent]
+            counters["requests"] += 1
+            counters["input_tokens"] += usage.get("input_tokens", 0)
+            counters["cached_tokens"] += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Return the requests, input and cached tokens and the cached ratio per agent."""
+        with self._lock:
+            return {
+                agent: {
+                    **counters,
+                    "cached_ratio": counters["cached_tokens"] / counters["input_tokens"] if counters["input_tokens"] else 0.0,
+                }
+                for agent, counters in self._agents.items()
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,142 @@
+"""Capture of the SQL the agents execute, with timing and `EXPLAIN QUERY PLAN`.
+
+Attach a `QueryLog` to an SQLAlchemy engine and every SELECT it runs within `measure` is
+recorded. SQLite does most of the work of a query while its rows are fetched, after the
+cursor has executed, so a query is timed up to the end of the `measure` block around it.
+Records are kept in memory and, when `SQL_QUERY_LOG` is set, appended as JSON lines to that
+file for `agent.index_advisor` to analyze. Query plans are looked up once per distinct query.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+
+# Attribute of the per-statement execution context holding the start time. Connections can be
+# shared (StaticPool), so the timing can't be kept on them
+_START_ATTRIBUTE = "_query_log_start"
+
+# Queries executed in the current `measure` block, with their start times
+_measured: ContextVar[list[tuple[float, "QueryRecord"]] | None] = ContextVar("_measured", default=None)
+
+
+@dataclass
+class QueryRecord:
+    """A captured query with its duration and query plan."""
+
+    sql: str
+    parameters: list[Any] | dict[str, Any] | None
+    duration_ms: float
+    plan: list[str]
+    executed_at: float = field(default_factory=time.time)
+
+
+def normalize(sql: str) -> str:
+    """Collapse whitespace and drop the trailing semicolon, so repeats of a query compare equal."""
+    return " ".join(sql.split()).rstrip(";")
+
+
+def is_query(sql: str) -> bool:
+    """Return whether `sql` is a query rather than a statement changing data or schema."""
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def explain_query_plan(connection: sqlite3.Connection, sql: str, parameters: Any = None) -> list[str]:
+    """Return the details of the `EXPLAIN QUERY PLAN` rows of `sql`."""
+    rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+    return [row[3] for row in rows]
+
+
+class QueryLog:
+    """Recorder of the queries an engine executes."""
+
+    def __init__(self, path: str | None = None, maxlen: int = 1000):
+        """Keep the last `maxlen` records and plans, appending every record to `path` if given."""
+        self.path = path
+        self.records: deque[QueryRecord] = deque(maxlen=maxlen)
+        self.failures = 0
+        self.max_plans = maxlen
+        self._plans: OrderedDict[str, list[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def attach(self, engine: "Engine") -> None:
+        """Record the queries executed through `engine`."""
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """Record the queries executed in the block, timed up to the end of the block."""
+        measured: list[tuple[float, QueryRecord]] = []
+        token = _measured.set(measured)
+        try:
+            yield
+        finally:
+            _measured.reset(token)
+            end = time.perf_counter()
+            for start, record in measured:
+                record.duration_ms = (end - start) * 1000
+                self.add(record)
+
+    def _plan(self, connection: sqlite3.Connection, sql: str, parameters: Any) -> list[str]:
+        key = normalize(sql)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        try:
+            plan = explain_query_plan(connection, sql, parameters)
+        except sqlite3.Error:
+            return []
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _before_cursor_execute(
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        if context is not None:
+            setattr(context, _START_ATTRIBUTE, time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        measured = _measured.get()
+        start = getattr(context, _START_ATTRIBUTE, None)
+        if measured is None or start is None or executemany or not is_query(statement):
+            return
+        parameters = list(parameters) if isinstance(parameters, tuple) else parameters
+        plan = self._plan(cursor.connection, statement, parameters)
+        # The duration is only known once the rows have been fetched, at the end of the block
+        measured.append((start, QueryRecord(sql=statement, parameters=parameters or None, duration_ms=0.0, plan=plan)))
+
+    def _handle_error(self, exception_context: Any) -> None:
+        # Failing statements, e.g. invalid SQL written by the model, never reach after_cursor_execute
+        with self._lock:
+            self.failures += 1
+
+    def add(self, record: QueryRecord) -> None:
+        """Keep `record` and append it to the log file."""
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a") as log:
+                    log.write(json.dumps(asdict(record), default=str) + "\n")
+
+
+query_log = QueryLog(path=os.environ.get("SQL_QUERY_LOG"))
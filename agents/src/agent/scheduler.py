@@ -0,0 +1,338 @@
+"""Client-side scheduling of Groq model requests.
+
+Groq model requests go through a shared `RequestScheduler` which keeps a budget per API key
+and model: a requests/min and a tokens/min token bucket plus a cap on in-flight requests.
+Callers queue FIFO per budget, so one thread can't starve the others, and requests that are
+still rate limited by the provider (HTTP 429) are retried with jittered exponential backoff.
+Models without limits, e.g. the OpenAI ones, are not throttled.
+
+The limits default to Groq's published free tier and are overridden per model with the
+`GROQ_RATE_LIMITS` environment variable, a JSON object such as
+`{"llama-3.3-70b-versatile": {"requests_per_minute": 1000, "tokens_per_minute": 300000}}`
+where `null` turns throttling of a model off.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Async waiters can't block on the threading condition, they re-check at least this often
+POLL_INTERVAL = 0.05
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """Requests and tokens per minute plus in-flight requests allowed for one model."""
+
+    requests_per_minute: int = 30
+    tokens_per_minute: int = 6000
+    max_concurrency: int = 4
+
+
+# Groq free tier limits per model (https://console.groq.com/docs/rate-limits)
+GROQ_RATE_LIMITS: dict[str, RateLimits] = {
+    "llama-3.1-8b-instant": RateLimits(requests_per_minute=30, tokens_per_minute=6000),
+    "llama-3.3-70b-versatile": RateLimits(requests_per_minute=30, tokens_per_minute=12000),
+    "meta-llama/llama-4-maverick-17b-128e-instruct": RateLimits(requests_per_minute=30, tokens_per_minute=6000),
+    "meta-llama/llama-4-scout-17b-16e-instruct": RateLimits(requests_per_minute=30, tokens_per_minute=30000),
+    "moonshotai/kimi-k2-instruct": RateLimits(requests_per_minute=60, tokens_per_minute=10000),
+    "moonshotai/kimi-k2-instruct-0905": RateLimits(requests_per_minute=60, tokens_per_minute=10000),
+    "openai/gpt-oss-20b": RateLimits(requests_per_minute=30, tokens_per_minute=8000),
+    "openai/gpt-oss-120b": RateLimits(requests_per_minute=30, tokens_per_minute=8000),
+    "qwen/qwen3-32b": RateLimits(requests_per_minute=60, tokens_per_minute=6000),
+}
+
+
+def load_model_limits(overrides: str | None = None) -> dict[str, RateLimits]:
+    """Return the Groq defaults updated with the JSON `overrides`, `GROQ_RATE_LIMITS` by default."""
+    overrides = os.environ.get("GROQ_RATE_LIMITS") if overrides is None else overrides
+    limits = dict(GROQ_RATE_LIMITS)
+    for model, values in json.loads(overrides or "{}").items():
+        if values is None:
+            limits.pop(model, None)
+        else:
+            limits[model] = replace(limits.get(model, RateLimits()), **values)
+    return limits
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to `capacity` over `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """Start with a full bucket."""
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken, 0 if it can be taken now."""
+        self._refill()
+        # Requests bigger than the bucket would never fit, let them through on a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Take `amount`, a negative amount gives tokens back. The bucket may go into debt."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - min(amount, self.capacity))
+
+
+@dataclass
+class _Budget:
+    limits: RateLimits
+    requests: TokenBucket
+    tokens: TokenBucket
+    queue: deque[int] = field(default_factory=deque)
+    in_flight: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Return whether `error` is the provider rejecting a request for its rate limit."""
+    return getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__
+
+
+def _retry_after(error: BaseException) -> float | None:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _reported_tokens(result: Any) -> int | None:
+    """Total tokens reported by a message, or by the last message of a model response."""
+    messages = getattr(result, "result", None)
+    if isinstance(messages, list) and messages:
+        result = messages[-1]
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class RequestScheduler:
+    """Budgets of model requests per API key and model, shared by every caller."""
+
+    def __init__(
+        self,
+        default_limits: RateLimits | None = None,
+        model_limits: dict[str, RateLimits] | None = None,
+        max_retries: int = 4,
+        base_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Throttle models by `model_limits`, others by `default_limits` or not at all if None."""
+        self.default_limits = default_limits
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._budgets: dict[tuple[str, str], _Budget] = {}
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+    def _budget(self, api_key: str | None, model: str) -> _Budget | None:
+        """Budget of `api_key` and `model`, None if the model isn't throttled."""
+        limits = self.model_limits.get(model, self.default_limits)
+        if limits is None:
+            return None
+        # Budgets are keyed by a digest so API keys are never kept around or exposed in metrics
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12] if api_key else "env"
+        with self._condition:
+            budget = self._budgets.get((key_id, model))
+            if budget is None:
+                budget = _Budget(
+                    limits=limits,
+                    requests=TokenBucket(limits.requests_per_minute, clock=self._clock),
+                    tokens=TokenBucket(limits.tokens_per_minute, clock=self._clock),
+                )
+                self._budgets[(key_id, model)] = budget
+            return budget
+
+    def _try_acquire(self, budget: _Budget, ticket: int, tokens: int) -> float:
+        """Acquire a slot for `ticket` or return how long to wait before trying again."""
+        if budget.queue[0] != ticket or budget.in_flight >= budget.limits.max_concurrency:
+            return math.inf
+        wait = max(budget.requests.wait_time(1), budget.tokens.wait_time(tokens))
+        if wait > 0:
+            return wait
+        budget.requests.take(1)
+        budget.tokens.take(tokens)
+        budget.in_flight += 1
+        budget.queue.popleft()
+        # The next ticket in line is now at the head of the queue
+        self._condition.notify_all()
+        return 0.0
+
+    def _acquire(self, budget: _Budget, tokens: int, cancelled: threading.Event | None = None) -> None:
+        # Cancellation isn't notified through the condition, it is checked at least this often
+        check_interval = 1.0 if cancelled is None else POLL_INTERVAL
+        with self._condition:
+            ticket = next(self._tickets)
+            budget.queue.append(ticket)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise CancelledError()
+                    if (wait := self._try_acquire(budget, ticket, tokens)) == 0:
+                        return
+                    self._condition.wait(timeout=min(wait, check_interval))
+            except BaseException:
+                budget.queue.remove(ticket)
+                self._condition.notify_all()
+                raise
+
+    async def _aacquire(self, budget: _Budget, tokens: int) -> None:
+        with self._condition:
+            ticket = next(self._tickets)
+            budget.queue.append(ticket)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_acquire(budget, ticket, tokens)
+                if wait == 0:
+                    return
+                await asyncio.sleep(min(wait, POLL_INTERVAL))
+        except BaseException:
+            with self._condition:
+                if ticket in budget.queue:
+                    budget.queue.remove(ticket)
+                self._condition.notify_all()
+            raise
+
+    def _release(self, budget: _Budget, estimated_tokens: int, result: Any = None) -> None:
+        with self._condition:
+            budget.in_flight -= 1
+            budget.completed += 1
+            # Settle the estimate against what the provider actually counted
+            used = _reported_tokens(result) if result is not None else None
+            if used is not None:
+                budget.tokens.take(used - estimated_tokens)
+            self._condition.notify_all()
+
+    def _backoff(self, budget: _Budget, attempt: int, error: BaseException) -> float | None:
+        """Delay before retrying a failed request, None if it shouldn't be retried."""
+        if not is_rate_limited(error):
+            return None
+        with self._condition:
+            budget.rate_limited += 1
+            if attempt >= self.max_retries:
+                return None
+            budget.retries += 1
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2**attempt))
+        return max(delay, _retry_after(error) or 0.0)
+
+    def run(
+        self,
+        api_key: str | None,
+        model: str,
+        call: Callable[[], T],
+        tokens: int = 0,
+        on_admitted: Callable[[], None] | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> T:
+        """Run `call` within the budget of `api_key` and `model`.
+
+        `tokens` is the estimated number of tokens the request will consume, it is corrected
+        with the provider's reported usage once the call returns. Models without limits are
+        called straight away. `on_admitted` is called whenever the request leaves the queue to
+        be sent, and a request still queued when `cancelled` is set raises `CancelledError`
+        without being sent.
+        """
+        budget = self._budget(api_key, model)
+        if budget is None:
+            if on_admitted is not None:
+                on_admitted()
+            return call()
+        for attempt in itertools.count():
+            self._acquire(budget, tokens, cancelled)
+            if on_admitted is not None:
+                on_admitted()
+            result = None
+            try:
+                result = call()
+                return result
+            except Exception as error:
+                delay = self._backoff(budget, attempt, error)
+                if delay is None:
+                    raise
+            finally:
+                self._release(budget, tokens, result)
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def arun(
+        self,
+        api_key: str | None,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        on_admitted: Callable[[], None] | None = None,
+    ) -> T:
+        """Async version of `run`, a queued request is dropped by cancelling its task."""
+        budget = self._budget(api_key, model)
+        if budget is None:
+            if on_admitted is not None:
+                on_admitted()
+            return await call()
+        for attempt in itertools.count():
+            await self._aacquire(budget, tokens)
+            if on_admitted is not None:
+                on_admitted()
+            result = None
+            try:
+                result = await call()
+                return result
+            except Exception as error:
+                delay = self._backoff(budget, attempt, error)
+                if delay is None:
+                    raise
+            finally:
+                self._release(budget, tokens, result)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def metrics(self) -> dict[str, Any]:
+        """Queue depth, in-flight requests and retry counters, overall and per budget."""
+        with self._condition:
+            budgets = {
+                f"{key_id}/{model}": {
+                    "queued": len(budget.queue),
+                    "in_flight": budget.in_flight,
+                    "completed": budget.completed,
+                    "rate_limited": budget.rate_limited,
+                    "retries": budget.retries,
+                }
+                for (key_id, model), budget in self._budgets.items()
+            }
+        return {
+            "queued": sum(budget["queued"] for budget in budgets.values()),
+            "in_flight": sum(budget["in_flight"] for budget in budgets.values()),
+            "budgets": budgets,
+        }
+
+
+scheduler = RequestScheduler(model_limits=load_model_limits())
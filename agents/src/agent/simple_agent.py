@@ -1,19 +1,29 @@
+import hashlib
+import json
+import threading
 from dataclasses import dataclass
 from enum import Enum
-from typing import Literal
+from functools import cache
+from typing import TYPE_CHECKING, Callable, Literal, Sequence, TypeVar
 
 from langchain.chat_models import init_chat_model
 from langchain.messages import SystemMessage
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage
 from langchain_core.messages.utils import count_tokens_approximately, trim_messages
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.runtime import Runtime
 from pydantic import BaseModel, Field
 
+from agent.hedging import hedge
+from agent.prompts import assemble_messages, prompt_cache_stats, static_prompt
+from agent.scheduler import scheduler
+from agent.speculation import SpeculativeCache
+from agent.wiki_loader import ProgressiveWikipediaLoader
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 
 def add(a: int, b: int) -> int:
     """Adding a and b.
@@ -94,10 +104,18 @@ class ContextSchema:
     message_strategy_delete: int
     agentic_tools: list[str] | None = None
     workflow_tools: list[str] | None = None
+    # Secondary model raced against `model` when it hasn't answered within `hedge_delay` seconds
+    hedge_model: str | None = None
+    hedge_delay: float = 2.0
+    # Run the searches concurrently with the should_search decision, dropping them if not needed
+    speculative_search: bool = False
     
     
 class SearchQuery(BaseModel):
     wikipedia_query: str | None = Field(None, description="Search query for retrieval.")
+    wikipedia_sections: list[str] | None = Field(
+        None, description="Article section topics to load when the article summary is not enough."
+    )
     web_query: str | None = Field(None, description="Search query for retrieval.")
     
     
@@ -111,6 +129,9 @@ def should_search(state: State, runtime: Runtime[ContextSchema]) -> Literal["sea
     # On first message, always search if tools are available
     if len(state["messages"]) <= 1:
         return "search"
+
+    if runtime.context.speculative_search:
+        speculate_search(state["messages"], runtime.context.workflow_tools)
         
     web_search_context = state.get("web_search_context", "")
     if web_search_context:
@@ -125,8 +146,8 @@ def should_search(state: State, runtime: Runtime[ContextSchema]) -> Literal["sea
         wiki_search_context_message = ""
     
     # For follow-up questions, use LLM to decide
-    decision_prompt: list = [SystemMessage(
-        content="""
+    decision_instructions = static_prompt(
+        """
             Analyze the user's latest message, conversation history and external search contexts if available.
             
             The latest message from the user is the message that needs to be analyzed most because it may or may not be
@@ -144,7 +165,7 @@ def should_search(state: State, runtime: Runtime[ContextSchema]) -> Literal["sea
             - It's a simple calculation or reasoning task
             - Generally prefer to avoid searching unless absolutely necessary
         """
-    )]
+    )
     
     class Decision(str, Enum):
         ANSWER_FROM_CONTEXT = "answer_from_context"
@@ -163,9 +184,7 @@ def should_search(state: State, runtime: Runtime[ContextSchema]) -> Literal["sea
             description="Quote the relevant part of context/history OR explain what's missing"
         )
         
-    # Add conversation history
-    decision_prompt.extend(state["messages"])
-
+    search_context_human_message = None
     if web_search_context_message or wiki_search_context_message:
         search_context_human_message = HumanMessage(
             content=f"""
@@ -175,23 +194,31 @@ def should_search(state: State, runtime: Runtime[ContextSchema]) -> Literal["sea
                 NOTE: The above context may NOT be relevant to the user's LATEST question below.
             """
         )
-        decision_prompt.append(search_context_human_message)
     
     # Make the latest user message explicit
-    decision_prompt.append(HumanMessage(content=f'''
+    latest_question_message = HumanMessage(content=f'''
         LATEST USER QUESTION TO ANALYZE: {state["messages"][-1].content}
         
         Does this LATEST question require a NEW search, or can it be answered from the historical context above?
-    '''))
+    ''')
+
+    # Static instructions and the growing history form a stable prefix, the per-turn parts come last
+    decision_prompt = assemble_messages(
+        decision_instructions, state["messages"], search_context_human_message, latest_question_message
+    )
     
-    decision_model = search_question_model.with_structured_output(SearchDecision)
-    decision = decision_model.invoke(decision_prompt)
+    decision = invoke_structured(SearchDecision, decision_prompt, "simple-agent:should-search")
 
-    return "search" if decision.decision == Decision.NEEDS_NEW_SEARCH else "conversation"
+    if decision.decision != Decision.NEEDS_NEW_SEARCH:
+        if runtime.context.speculative_search:
+            discard_speculative_search(state["messages"], runtime.context.workflow_tools)
+        return "conversation"
+
+    return "search"
     
     
 search_instructions = SystemMessage(
-    content="""
+    content=static_prompt("""
         You will be given a conversation between an llm assistant and a user.
         Your goal is to generate search queries for different search engines.
         There is no need to analyze the full conversation.
@@ -200,65 +227,152 @@ search_instructions = SystemMessage(
         RULES:
         - Wikipedia search is lexical and title-based.
         Return short queries (1–3 words) targeting canonical article titles.
+        Article summaries are always loaded. Only when the question needs more depth than a summary,
+        list the topics of the article sections to load as well (e.g. "History", "Design").
         - Web search is semantic.
         Return descriptive, natural-language queries.
-    """
+    """)
 )
 
 
-# model = init_chat_model(configurable_fields="any")
-search_question_model = ChatOpenAI(model="gpt-5-nano", temperature=0, disable_streaming=True)
+# Built when a turn first needs search, importing langchain_openai was most of this module's import time
+@cache
+def get_search_question_model() -> "ChatOpenAI":
+    """Return the model which decides on searching and plans the search queries."""
+    from langchain_openai import ChatOpenAI
 
+    # model = init_chat_model(configurable_fields="any")
+    return ChatOpenAI(model="gpt-5-nano", temperature=0, disable_streaming=True)
 
-def search_web(state: State, runtime: Runtime[ContextSchema]):
-    """ Retrieve docs from web search """
-    
-    if runtime.context.workflow_tools and "tavily" in runtime.context.workflow_tools:
 
+Structured = TypeVar("Structured", bound=BaseModel)
+
+
+def invoke_structured(schema: type[Structured], prompt: Sequence[BaseMessage], agent: str) -> Structured:
+    """Invoke the search question model for `schema`, recording the prompt caching of the raw response."""
+    output = get_search_question_model().with_structured_output(schema, include_raw=True).invoke(prompt)
+    prompt_cache_stats.record(agent, output["raw"])
+    if output["parsing_error"]:
+        raise output["parsing_error"]
+    parsed: Structured = output["parsed"]
+    return parsed
+
+
+def plan_search_query(messages: Sequence[BaseMessage]) -> SearchQuery:
+    """Turn the conversation into a search query."""
+    return invoke_structured(SearchQuery, [search_instructions, *messages], "simple-agent:search-query")
+
+
+def web_search(messages: Sequence[BaseMessage], search_query: SearchQuery | None = None) -> dict[str, list[str]]:
+    """Search the web with Tavily, planning the query from `messages` unless one is given."""
+    from langchain_tavily import TavilySearch
+
+    # Search
+    tavily_search = TavilySearch(max_results=1, include_raw_content=True)
+
+    # Search query
+    search_query = search_query or plan_search_query(messages)
+    if not search_query.web_query:
+        return {}
+
+    # Search
+    search_docs = tavily_search.invoke(search_query.web_query)
+
+    # Format
+    formatted_search_docs = "\n\n---\n\n".join(
+        [
+            f'<Document href="{doc["url"]}"/>\n{doc["raw_content"]}\n</Document>'
+            for doc in search_docs["results"]
+        ],
+    )
+
+    return {"web_search_context": [formatted_search_docs]}
+
+
+def wikipedia_search(
+    messages: Sequence[BaseMessage], search_query: SearchQuery | None = None
+) -> dict[str, list[str]] | None:
+    """Search Wikipedia, planning the query from `messages` unless one is given."""
+    # Search query
+    search_query = search_query or plan_search_query(messages)
+
+    if search_query.wikipedia_query:
         # Search
-        tavily_search = TavilySearch(max_results=1, include_raw_content=True)
-    
-        # Search query
-        structured_llm = search_question_model.with_structured_output(SearchQuery)
-        search_query = structured_llm.invoke([search_instructions] + state["messages"])
-    
-        # Search
-        search_docs = tavily_search.invoke(search_query.web_query)
-    
+        search_docs = ProgressiveWikipediaLoader(
+            query=search_query.wikipedia_query, load_max_docs=2, sections=search_query.wikipedia_sections
+        ).load()
+
         # Format
         formatted_search_docs = "\n\n---\n\n".join(
             [
-                f'<Document href="{doc["url"]}"/>\n{doc["raw_content"]}\n</Document>'
-                for doc in search_docs["results"]
+                f'<Document source="{doc.metadata["source"]}"'
+                f'page="{doc.metadata.get("page", "")}" section="{doc.metadata.get("section", "")}"/>'
+                f'\n{doc.page_content}\n</Document>'
+                for doc in search_docs
             ],
         )
+
+        return {"wiki_search_context": [formatted_search_docs]}
+
+    return None
+
+
+search_tools: dict[str, Callable[[Sequence[BaseMessage], SearchQuery | None], dict[str, list[str]] | None]] = {
+    "tavily": web_search,
+    "wikipedia": wikipedia_search,
+}
+speculative_searches = SpeculativeCache()
+
+
+def search_key(messages: Sequence[BaseMessage], tool: str) -> tuple[str, str]:
+    """Return the key of the search with `tool` for the conversation `messages`."""
+    conversation = json.dumps([(message.type, message.content) for message in messages], default=str)
+    return hashlib.sha256(conversation.encode()).hexdigest(), tool
+
+
+def speculate_search(messages: Sequence[BaseMessage], workflow_tools: list[str]) -> None:
+    """Start planning and running the searches before `should_search` has decided."""
+    lock = threading.Lock()
+    planned: list[SearchQuery] = []
+
+    # Both searches share one query planning call, whichever starts first makes it
+    def search_query() -> SearchQuery:
+        with lock:
+            if not planned:
+                planned.append(plan_search_query(messages))
+        return planned[0]
+
+    for tool in workflow_tools:
+        if tool in search_tools:
+            speculative_searches.start(
+                search_key(messages, tool), lambda search=search_tools[tool]: search(messages, search_query())
+            )
+
+
+def discard_speculative_search(messages: Sequence[BaseMessage], workflow_tools: list[str]) -> None:
+    """Mark the speculative searches as not needed once `should_search` has decided against them."""
+    for tool in workflow_tools:
+        speculative_searches.discard(search_key(messages, tool))
+
+
+def search_web(state: State, runtime: Runtime[ContextSchema]):
+    """ Retrieve docs from web search """
     
-        return {"web_search_context": [formatted_search_docs]}
+    if runtime.context.workflow_tools and "tavily" in runtime.context.workflow_tools:
+        # The speculative search if there is one and it succeeded, otherwise search now
+        return speculative_searches.result(
+            search_key(state["messages"], "tavily"), lambda: web_search(state["messages"])
+        )
 
 
 def search_wikipedia(state: State, runtime: Runtime[ContextSchema]):
     """ Retrieve docs from wikipedia """
     
     if runtime.context.workflow_tools and "wikipedia" in runtime.context.workflow_tools:
-
-        # Search query
-        structured_llm = search_question_model.with_structured_output(SearchQuery)
-        search_query = structured_llm.invoke([search_instructions] + state["messages"])
-        
-        if search_query.wikipedia_query:
-            # Search
-            search_docs = WikipediaLoader(query=search_query.wikipedia_query, load_max_docs=2).load()
-        
-            # Format
-            formatted_search_docs = "\n\n---\n\n".join(
-                [
-                    f'<Document source="{doc.metadata["source"]}"'
-                    f'page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-                    for doc in search_docs
-                ],
-            )
-        
-            return {"wiki_search_context": [formatted_search_docs]}
+        # The speculative search if there is one and it succeeded, otherwise search now
+        return speculative_searches.result(
+            search_key(state["messages"], "wikipedia"), lambda: wikipedia_search(state["messages"])
+        )
 
 
 def get_llm_context(state: State, runtime: Runtime[ContextSchema]) -> list:
@@ -309,20 +423,43 @@ def call_llm(runtime, system_message, messages, use_system_message):
     if use_system_message:
         messages = system_message + messages
 
+    # The hedge delay starts once the primary has left the scheduler's queue, and if the secondary wins
+    # while the primary is queued again for a retry, the primary drops out instead of being sent
+    admitted, cancelled = threading.Event(), threading.Event()
+
+    def invoke(
+        model_name: str, on_admitted: Callable[[], None] | None = None, cancelled: threading.Event | None = None
+    ) -> Callable[[], BaseMessage]:
+        return lambda: scheduler.run(
+            runtime.context.token,
+            model_name,
+            lambda: call_model.invoke(
+                messages,
+                config={
+                    "configurable": {
+                        "model": model_name,
+                        "api_key": runtime.context.token,
+                        "temperature": runtime.context.temperature,
+                        "max_tokens": runtime.context.max_tokens
+                    }
+                }
+            ),
+            tokens=count_tokens_approximately(messages) + runtime.context.max_tokens,
+            on_admitted=on_admitted,
+            cancelled=cancelled,
+        )
+
     # if runtime.context.model in ["gpt-5-nano", "claude-3-haiku-20240307"]:
     messages = [
-        call_model.invoke(
-            messages,
-            config={
-                "configurable": {
-                    "model": runtime.context.model,
-                    "api_key": runtime.context.token,
-                    "temperature": runtime.context.temperature,
-                    "max_tokens": runtime.context.max_tokens
-                }
-            }
+        hedge(
+            invoke(runtime.context.model, admitted.set, cancelled),
+            invoke(runtime.context.hedge_model) if runtime.context.hedge_model else None,
+            runtime.context.hedge_delay,
+            admitted=admitted,
+            cancelled=cancelled,
         )
     ]
+    prompt_cache_stats.record("simple-agent", messages[-1])
     print(f"MESSAGES: {messages}")
     return {
         "messages": messages
@@ -394,21 +531,17 @@ def conversation(state: State, runtime: Runtime[ContextSchema]):
     else:
         wiki_search_context_message = ""
         
-    system_message = [
-        SystemMessage(
-            content=(
-                # "You are a helpful assistant tasked with performing arithmetic on a set of inputs."
-                "You are a helpful assistant. Use the provided context to answer the user's question."
-                f"{summary_message}"
-                f"{web_search_context_message}"
-                f"{wiki_search_context_message}"
-            )
-        )
-    ]
-
-    messages = get_llm_context(state, runtime)
+    # The static instructions and the history stay a cacheable prefix, the changing context goes last
+    messages = assemble_messages(
+        # "You are a helpful assistant tasked with performing arithmetic on a set of inputs."
+        "You are a helpful assistant. Use the provided context to answer the user's question.",
+        get_llm_context(state, runtime),
+        summary_message,
+        web_search_context_message,
+        wiki_search_context_message,
+    )
 
-    return call_llm(runtime, system_message, messages, use_system_message=True)
+    return call_llm(runtime, None, messages, use_system_message=False)
 
 
 
@@ -0,0 +1,92 @@
+"""Speculative execution of work that may turn out not to be needed.
+
+Work is started under a key before the decision whether it is needed has been made. If it is
+needed, `result` waits for the already running work (a hit if it succeeds, otherwise the
+fallback runs, as it does for work that hasn't started yet), if not `discard` cancels it if
+it hasn't started yet (waste). Finished results
+stay cached, bounded by `max_entries`, so an identical later request can still use them.
+"""
+
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SpeculativeCache:
+    """Speculatively started work by key, with hit and waste counts."""
+
+    def __init__(self, max_entries: int = 128, max_workers: int = 8):
+        """Keep up to `max_entries` results, running at most `max_workers` pieces of work at a time."""
+        self.max_entries = max_entries
+        self.started = 0
+        self.hits = 0
+        self.failed = 0
+        self.wasted = 0
+        self._futures: OrderedDict[Hashable, Future[Any]] = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+
+    def start(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Future[Any]:
+        """Start `fn(*args)` under `key` unless it is already running or cached.
+
+        The work runs in a copy of the caller's context, so callbacks and tracing still apply.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            # Failed work is started again rather than handing out the same error
+            if future is not None and not future.cancelled() and not (future.done() and future.exception()):
+                self._futures.move_to_end(key)
+                return future
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+            self._futures[key] = future
+            self.started += 1
+            while len(self._futures) > self.max_entries:
+                _, evicted = self._futures.popitem(last=False)
+                evicted.cancel()
+            return future
+
+    def result(self, key: Hashable, fallback: Callable[[], T]) -> T:
+        """Return the result of the work under `key`, or that of `fallback` if there is none or it failed.
+
+        Work still waiting for a worker is cancelled and `fallback` runs right away rather than
+        waiting behind other speculative work.
+        """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None and not future.cancel():
+            try:
+                result: T = future.result()
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.hits += 1
+                return result
+        return fallback()
+
+    def discard(self, key: Hashable) -> None:
+        """Mark the work under `key` as not needed."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                return
+            self.wasted += 1
+            if future.cancel():
+                del self._futures[key]
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the started, hit, failed and wasted work and the hit and waste ratios."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "failed": self.failed,
+                "wasted": self.wasted,
+                "hit_ratio": self.hits / self.started if self.started else 0.0,
+                "waste_ratio": self.wasted / self.started if self.started else 0.0,
+            }
@@ -1,14 +1,36 @@
 from dataclasses import dataclass
-from typing import Literal
+from functools import cache
+from typing import TYPE_CHECKING, Literal
 
 from langchain.chat_models import init_chat_model
-from langchain.messages import AIMessage, SystemMessage
-from langchain_community.tools import ShellTool
+from langchain.messages import AIMessage
+from langchain.tools import tool
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.runnables import Runnable
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.runtime import Runtime
 
-shell_tool = ShellTool()
+from agent.prompts import assemble_messages, prompt_cache_stats
+
+if TYPE_CHECKING:
+    from langchain_community.tools import ShellTool
+
+
+# langchain_community is only imported once the model runs its first command
+@cache
+def get_shell_tool() -> "ShellTool":
+    """Return the shell tool behind the `terminal` tool."""
+    from langchain_community.tools import ShellTool
+
+    return ShellTool()
+
+
+@tool("terminal")
+def shell_tool(commands: str | list[str]) -> str:
+    """Run shell commands on this machine. Pass a single command or a list of commands."""
+    output: str = get_shell_tool().run({"commands": commands})
+    return output
 
 
 class State(MessagesState):
@@ -20,34 +42,37 @@ class ContextSchema:
     model: Literal["gpt-5-nano", "gpt-5-mini", "gpt-5.1", "gpt-5.2"] | None = None
 
 
-model = init_chat_model(
-    model="gpt-5.1",
-    temperature=0.7,
-    max_tokens=2048
+system_prompt = (
+    "You are a helpful assistant with access to shell commands via ShellTool. "
+    "Important guidelines for file searches:\n"
+    "- Avoid searching from root (/) as it takes too long\n"
+    "- Use specific directories like /home/username or ~/Documents\n"
+    "- Use 'find' with -maxdepth option to limit search depth\n"
+    "- For file content, limit output with 'head' or 'tail' for large files\n"
+    "- Consider using 'locate' command if the system has it (much faster than find)\n"
+    "Commands have a 60-second timeout, so plan accordingly."
 )
-model = model.bind_tools([shell_tool])
+
+
+@cache
+def get_model() -> Runnable[LanguageModelInput, AIMessage]:
+    """Return the conversation model with the terminal tool bound."""
+    model = init_chat_model(
+        model="gpt-5.1",
+        temperature=0.7,
+        max_tokens=2048
+    )
+    return model.bind_tools([shell_tool])
 
 
 def conversation(state: State, runtime: Runtime[ContextSchema]):        
-    system_message = [
-        SystemMessage(
-            content=(
-                "You are a helpful assistant with access to shell commands via ShellTool. "
-                "Important guidelines for file searches:\n"
-                "- Avoid searching from root (/) as it takes too long\n"
-                "- Use specific directories like /home/username or ~/Documents\n"
-                "- Use 'find' with -maxdepth option to limit search depth\n"
-                "- For file content, limit output with 'head' or 'tail' for large files\n"
-                "- Consider using 'locate' command if the system has it (much faster than find)\n"
-                "Commands have a 60-second timeout, so plan accordingly."
-            )
-        )
-    ]
+    messages = assemble_messages(system_prompt, state["messages"])
+
+    response = get_model().invoke(messages)
+    prompt_cache_stats.record("tools-mcp-agent", response)
 
     return {
-        "messages": [
-            model.invoke(system_message + state["messages"])
-        ]
+        "messages": [response]
     }
     
 def should_continue(state: State, runtime: Runtime[ContextSchema]) -> Literal["tools", END]:
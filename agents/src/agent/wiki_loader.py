@@ -0,0 +1,196 @@
+"""Progressive Wikipedia loading.
+
+Instead of downloading whole articles like `WikipediaLoader`, the lead section (summary) of
+each matching page is fetched first and specific sections only when they are asked for.
+Everything fetched is cached on the client, which is shared between turns, up to
+`max_entries` responses (least recently used are evicted first), and documents are produced
+lazily so a caller that stops early never triggers the remaining requests.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Any, Callable, Iterator
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = "llm-playground/0.0.1 (https://github.com/Srednogorie/llm-playground)"
+
+# Sections which never help answering a question
+SKIPPED_SECTIONS = {"see also", "references", "external links", "notes", "further reading", "bibliography", "sources"}
+
+
+def _http_fetch(params: dict[str, Any]) -> bytes:
+    request = Request(f"{API_URL}?{urlencode(params)}", headers={"User-Agent": USER_AGENT})
+    with urlopen(request, timeout=10) as response:
+        body: bytes = response.read()
+        return body
+
+
+class _TextExtractor(HTMLParser):
+    """Plain text of rendered section HTML, without tables, references and styles."""
+
+    ignored_tags = {"style", "script", "sup", "table"}
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parts: list[str] = []
+        self._ignored_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in self.ignored_tags:
+            self._ignored_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.ignored_tags and self._ignored_depth:
+            self._ignored_depth -= 1
+        elif tag in ("p", "li", "h2", "h3", "h4"):
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._ignored_depth:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def html_to_text(html: str) -> str:
+    """Return the plain text of rendered section HTML."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    return extractor.text()
+
+
+class WikipediaClient:
+    """Cached access to page summaries and individual sections through the MediaWiki API."""
+
+    def __init__(self, fetch: Callable[[dict[str, Any]], bytes] = _http_fetch, max_entries: int = 512):
+        """Request pages with `fetch`, caching up to `max_entries` responses."""
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.cache_hits = 0
+        self._cache: OrderedDict[tuple[Any, ...], dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: tuple[Any, ...], params: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            if key in self._cache:
+                self.cache_hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        body = self.fetch({**params, "format": "json", "formatversion": 2, "redirects": 1})
+        response: dict[str, Any] = json.loads(body)
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(body)
+            self._cache[key] = response
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return response
+
+    def search(self, query: str, limit: int) -> list[str]:
+        """Return the titles of up to `limit` pages matching `query`."""
+        response = self._get(
+            ("search", query, limit),
+            {"action": "query", "list": "search", "srsearch": query, "srlimit": limit, "srprop": ""},
+        )
+        return [result["title"] for result in response["query"]["search"]]
+
+    def summary(self, title: str) -> dict[str, str]:
+        """Title, URL and plain-text lead section of the page."""
+        response = self._get(
+            ("summary", title),
+            {
+                "action": "query",
+                "prop": "extracts|info",
+                "exintro": 1,
+                "explaintext": 1,
+                "inprop": "url",
+                "titles": title,
+            },
+        )
+        page = response["query"]["pages"][0]
+        return {"title": page["title"], "url": page.get("fullurl", ""), "extract": page.get("extract", "")}
+
+    def sections(self, title: str) -> list[dict[str, Any]]:
+        """Return the table of contents of the page."""
+        response = self._get(("sections", title), {"action": "parse", "page": title, "prop": "sections"})
+        sections: list[dict[str, Any]] = response["parse"]["sections"]
+        return sections
+
+    def section_text(self, title: str, index: str) -> str:
+        """Return the plain text of the section `index` of the page."""
+        response = self._get(
+            ("section", title, index),
+            {
+                "action": "parse",
+                "page": title,
+                "section": index,
+                "prop": "text",
+                "disabletoc": 1,
+                "disableeditsection": 1,
+            },
+        )
+        return html_to_text(response["parse"]["text"])
+
+    def matching_sections(self, title: str, topics: list[str]) -> list[dict[str, Any]]:
+        """Sections of the page whose heading shares a word with one of `topics`."""
+        words = {word for topic in topics for word in topic.lower().split() if len(word) > 2}
+        return [
+            section
+            for section in self.sections(title)
+            if section["line"].lower() not in SKIPPED_SECTIONS and words & set(section["line"].lower().split())
+        ]
+
+    def stats(self) -> dict[str, int]:
+        """Return the requests made, bytes fetched, cache hits and cached responses."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_fetched": self.bytes_fetched,
+                "cache_hits": self.cache_hits,
+                "cached": len(self._cache),
+            }
+
+
+wikipedia_client = WikipediaClient()
+
+
+class ProgressiveWikipediaLoader(BaseLoader):
+    """Load page summaries for `query`, plus the sections matching `sections` if given."""
+
+    def __init__(
+        self,
+        query: str,
+        load_max_docs: int = 2,
+        sections: list[str] | None = None,
+        client: WikipediaClient | None = None,
+    ):
+        """Load up to `load_max_docs` pages through `client`, the shared client by default."""
+        self.query = query
+        self.load_max_docs = load_max_docs
+        self.sections = sections or []
+        self.client = client or wikipedia_client
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yield each page's summary, followed by its matching sections."""
+        for title in self.client.search(self.query, self.load_max_docs):
+            summary = self.client.summary(title)
+            metadata = {"title": summary["title"], "source": summary["url"], "page": summary["title"]}
+            yield Document(page_content=summary["extract"], metadata={**metadata, "section": "summary"})
+
+            if self.sections:
+                for section in self.client.matching_sections(title, self.sections):
+                    yield Document(
+                        page_content=self.client.section_text(title, section["index"]),
+                        metadata={**metadata, "section": section["line"]},
+                    )
@@ -0,0 +1,115 @@
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from agent.dispatch import SubagentDispatcher, subagent_dispatcher
+
+
+def test_tasks_of_a_subagent_are_capped() -> None:
+    dispatcher = SubagentDispatcher({"sql-agent": 2}, default_limit=4)
+    active: dict[str, int] = {"sql-agent": 0, "analyst-agent": 0}
+    peak = dict(active)
+
+    async def task(subagent: str, result: int) -> int:
+        active[subagent] += 1
+        peak[subagent] = max(peak[subagent], active[subagent])
+        await asyncio.sleep(0.05)
+        active[subagent] -= 1
+        return result
+
+    async def dispatch() -> list[int]:
+        calls = [("sql-agent", index) for index in range(5)] + [("analyst-agent", index) for index in range(5, 9)]
+        return await asyncio.gather(
+            *(dispatcher.run(subagent, lambda s=subagent, i=index: task(s, i)) for subagent, index in calls)
+        )
+
+    assert asyncio.run(dispatch()) == list(range(9))
+    assert peak == {"sql-agent": 2, "analyst-agent": 4}
+    snapshot = dispatcher.snapshot()
+    assert snapshot["sql-agent"]["peak_in_flight"] == 2
+    assert snapshot["sql-agent"]["tasks"] == 5
+    assert snapshot["sql-agent"]["mean_wait_s"] > snapshot["analyst-agent"]["mean_wait_s"]
+
+
+def test_failed_tasks_are_timed_and_release_their_slot() -> None:
+    dispatcher = SubagentDispatcher(default_limit=1)
+
+    async def fail() -> None:
+        raise RuntimeError("database is locked")
+
+    async def succeed() -> str:
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(dispatcher.run("sql-agent", fail, "call_1"))
+    assert asyncio.run(dispatcher.run("sql-agent", succeed, "call_2")) == "ok"
+
+    first, second = dispatcher.timings()
+    assert (first.task_id, first.ok) == ("call_1", False)
+    assert (second.task_id, second.ok) == ("call_2", True)
+    assert dispatcher.snapshot()["sql-agent"]["failures"] == 1
+
+
+def test_waiting_tasks_start_in_arrival_order() -> None:
+    dispatcher = SubagentDispatcher({"sql-agent": 1})
+    order = []
+
+    async def task(index: int) -> None:
+        order.append(index)
+        await asyncio.sleep(0.01)
+
+    async def dispatch() -> None:
+        await asyncio.gather(*(dispatcher.run("sql-agent", lambda i=index: task(i)) for index in range(6)))
+
+    asyncio.run(dispatch())
+    assert order == list(range(6))
+    assert dispatcher.snapshot()["sql-agent"]["in_flight"] == 0
+
+
+def test_cancelled_waiters_give_up_their_place() -> None:
+    dispatcher = SubagentDispatcher({"sql-agent": 1})
+
+    async def dispatch() -> str:
+        release = asyncio.Event()
+        running = asyncio.create_task(dispatcher.run("sql-agent", release.wait))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(dispatcher.run("sql-agent", release.wait))
+        waiting = asyncio.create_task(dispatcher.run("sql-agent", lambda: asyncio.sleep(0, "done")))
+        await asyncio.sleep(0)
+        assert dispatcher.snapshot()["sql-agent"]["queued"] == 2
+
+        cancelled.cancel()
+        release.set()
+        await running
+        return await waiting
+
+    assert asyncio.run(dispatch()) == "done"
+    assert dispatcher.snapshot()["sql-agent"]["in_flight"] == 0
+
+
+def test_same_turn_sql_tasks_query_at_once(tmp_path: Path) -> None:
+    database = tmp_path / "chinook.sqlite"
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE Invoice (BillingCountry TEXT, Total REAL)")
+    # Like the sql-agent's engine: pooled read-only connections to the database file
+    engine = create_engine(f"sqlite:///file:{database}?mode=ro&uri=true", connect_args={"check_same_thread": False})
+    # Both tasks hold their query open until the other one has started its own
+    both_querying = threading.Barrier(2, timeout=5)
+
+    def query() -> list[tuple]:
+        with engine.connect() as connection:
+            result = connection.execute(text("SELECT BillingCountry, SUM(Total) FROM Invoice GROUP BY BillingCountry"))
+            both_querying.wait()
+            return list(result.fetchall())
+
+    async def turn() -> list[list[tuple]]:
+        return await asyncio.gather(
+            *(subagent_dispatcher.run("sql-agent", lambda: asyncio.to_thread(query), task_id) for task_id in "ab")
+        )
+
+    assert asyncio.run(turn()) == [[], []]
+    assert subagent_dispatcher.snapshot()["sql-agent"]["peak_in_flight"] == 2
@@ -0,0 +1,166 @@
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Callable
+
+import pytest
+
+from agent.hedging import HedgeStats, ahedge, hedge
+from agent.scheduler import RateLimits, RequestScheduler
+
+run_name: contextvars.ContextVar[str] = contextvars.ContextVar("run_name", default="")
+
+
+def fake_model(answer: str, latency: float, error: Exception | None = None):
+    def call() -> str:
+        time.sleep(latency)
+        if error:
+            raise error
+        return answer
+
+    return call
+
+
+def afake_model(answer: str, latency: float, error: Exception | None = None):
+    async def call() -> str:
+        await asyncio.sleep(latency)
+        if error:
+            raise error
+        return answer
+
+    return call
+
+
+def test_fast_primary_is_not_hedged() -> None:
+    stats = HedgeStats()
+    assert hedge(fake_model("primary", 0), fake_model("secondary", 0), 0.5, stats) == "primary"
+    assert stats.requests == 1
+    assert stats.hedge_rate == 0
+
+
+def test_slow_primary_loses_to_secondary() -> None:
+    stats = HedgeStats()
+    assert hedge(fake_model("primary", 1), fake_model("secondary", 0), 0.05, stats) == "secondary"
+    assert stats.hedged == 1
+    assert stats.win_rate == 1
+
+
+def test_failed_primary_falls_back() -> None:
+    stats = HedgeStats()
+    answer = hedge(fake_model("primary", 0, RuntimeError("429")), fake_model("secondary", 0), 5, stats)
+    assert answer == "secondary"
+    assert stats.fallbacks == 1
+
+
+def test_both_failing_raises_first_error() -> None:
+    stats = HedgeStats()
+    with pytest.raises(RuntimeError, match="primary"):
+        hedge(fake_model("", 0, RuntimeError("primary")), fake_model("", 0, ValueError("secondary")), 5, stats)
+    assert stats.failures == 1
+
+
+def test_async_hedge_cancels_loser() -> None:
+    stats = HedgeStats()
+    start = time.monotonic()
+    answer = asyncio.run(ahedge(afake_model("primary", 5), afake_model("secondary", 0.01), 0.05, stats))
+    assert answer == "secondary"
+    assert time.monotonic() - start < 1
+    assert stats.snapshot()["secondary_wins"] == 1
+
+
+def test_async_slow_secondary_still_lets_primary_win() -> None:
+    stats = HedgeStats()
+    answer = asyncio.run(ahedge(afake_model("primary", 0.1), afake_model("secondary", 5), 0.01, stats))
+    assert answer == "primary"
+    assert stats.hedged == 1
+    assert stats.secondary_wins == 0
+
+
+def test_hedged_calls_keep_the_callers_context() -> None:
+    run_name.set("call_model")
+    assert hedge(run_name.get, run_name.get, 0) == "call_model"
+    assert hedge(lambda: time.sleep(0.1) or run_name.get(), run_name.get, 0.01) == "call_model"
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("429")
+        self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+def test_queued_primary_is_not_hedged() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000, max_concurrency=1))
+    calls: list[str] = []
+
+    def model(answer: str, latency: float) -> Callable[[], str]:
+        return lambda: calls.append(answer) or time.sleep(latency) or answer
+
+    busy = threading.Thread(target=scheduler.run, args=("key", "model", model("busy", 0.2)))
+    busy.start()
+    time.sleep(0.05)
+    stats = HedgeStats()
+    admitted, cancelled = threading.Event(), threading.Event()
+    answer = hedge(
+        lambda: scheduler.run("key", "model", model("primary", 0), on_admitted=admitted.set, cancelled=cancelled),
+        model("secondary", 0),
+        0.05,
+        stats,
+        admitted=admitted,
+        cancelled=cancelled,
+    )
+    busy.join()
+
+    # The wait for the slot doesn't count towards the hedge delay
+    assert answer == "primary"
+    assert calls == ["busy", "primary"]
+    assert stats.hedged == 0
+
+
+def test_primary_queued_for_a_retry_drops_out_when_the_secondary_wins() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000))
+    calls: list[str] = []
+
+    def primary() -> str:
+        calls.append("primary")
+        raise RateLimitError(retry_after=0.3)
+
+    stats = HedgeStats()
+    admitted, cancelled = threading.Event(), threading.Event()
+    answer = hedge(
+        lambda: scheduler.run("key", "model", primary, on_admitted=admitted.set, cancelled=cancelled),
+        lambda: calls.append("secondary") or "secondary",
+        0.05,
+        stats,
+        admitted=admitted,
+        cancelled=cancelled,
+    )
+    time.sleep(0.5)
+
+    assert answer == "secondary"
+    # The primary's retry is never sent
+    assert calls == ["primary", "secondary"]
+    assert scheduler.metrics()["queued"] == 0
+
+
+def test_async_queued_primary_is_not_hedged() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000, max_concurrency=1))
+
+    async def run() -> list[str]:
+        busy = asyncio.ensure_future(scheduler.arun("key", "model", afake_model("busy", 0.2)))
+        await asyncio.sleep(0.05)
+        admitted = asyncio.Event()
+        answer = await ahedge(
+            lambda: scheduler.arun("key", "model", afake_model("primary", 0), on_admitted=admitted.set),
+            afake_model("secondary", 0),
+            0.05,
+            stats,
+            admitted=admitted,
+        )
+        return [await busy, answer]
+
+    stats = HedgeStats()
+    assert asyncio.run(run()) == ["busy", "primary"]
+    assert stats.hedged == 0
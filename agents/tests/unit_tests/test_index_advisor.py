@@ -0,0 +1,59 @@
+import sqlite3
+
+from agent.index_advisor import IndexAdvisor, benchmark, create_working_copy
+from agent.query_log import QueryRecord, explain_query_plan
+
+REVENUE_BY_COUNTRY = (
+    "SELECT c.Country, SUM(i.Total) FROM Invoice i JOIN Customer c ON i.CustomerId = c.CustomerId "
+    "GROUP BY c.Country"
+)
+TRACKS_BY_COMPOSER = "SELECT Name FROM Track WHERE Composer = ?"
+
+
+def make_db(path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE Customer (CustomerId INTEGER PRIMARY KEY, Country TEXT, Email TEXT);
+        CREATE TABLE Invoice (InvoiceId INTEGER PRIMARY KEY, CustomerId INTEGER, Total REAL, BillingCity TEXT);
+        CREATE TABLE Track (TrackId INTEGER PRIMARY KEY, Name TEXT, Composer TEXT, Milliseconds INTEGER);
+        """
+    )
+    connection.executemany("INSERT INTO Customer VALUES (?, ?, ?)", [(i, f"C{i % 5}", "") for i in range(50)])
+    connection.executemany("INSERT INTO Invoice VALUES (?, ?, ?, '')", [(i, i % 50, i * 0.5) for i in range(500)])
+    connection.executemany("INSERT INTO Track VALUES (?, ?, ?, 0)", [(i, f"T{i}", f"A{i % 20}") for i in range(500)])
+    connection.commit()
+    return connection
+
+
+def record(connection: sqlite3.Connection, sql: str, parameters=None) -> QueryRecord:
+    return QueryRecord(sql, parameters, 1.0, explain_query_plan(connection, sql, parameters))
+
+
+def test_repeated_scans_get_covering_indexes(tmp_path) -> None:
+    connection = make_db(tmp_path / "chinook.sqlite")
+    records = [record(connection, REVENUE_BY_COUNTRY), record(connection, TRACKS_BY_COMPOSER, ["A1"])] * 2
+
+    advisor = IndexAdvisor(connection)
+    assert advisor.findings(records)["full_scans"] == {"Invoice": 2, "Track": 2}
+    suggestions = {suggestion.name: suggestion for suggestion in advisor.suggest(records)}
+    assert "idx_advisor_Invoice_CustomerId_Total" in suggestions
+    assert "idx_advisor_Track_Composer_Name" in suggestions
+    assert any(suggestion.kind == "summary_table" for suggestion in suggestions.values())
+
+
+def test_single_queries_are_left_alone(tmp_path) -> None:
+    connection = make_db(tmp_path / "chinook.sqlite")
+    assert IndexAdvisor(connection).suggest([record(connection, TRACKS_BY_COMPOSER, ["A1"])]) == []
+
+
+def test_suggestions_only_touch_the_working_copy(tmp_path) -> None:
+    connection = make_db(tmp_path / "chinook.sqlite")
+    records = [record(connection, TRACKS_BY_COMPOSER, ["A1"])] * 3
+    suggestions = IndexAdvisor(connection).suggest(records)
+
+    copy = create_working_copy(tmp_path / "chinook.sqlite", tmp_path / "copy.sqlite", suggestions)
+    results = benchmark(connection, copy, records, suggestions, repeat=1)
+
+    assert explain_query_plan(connection, TRACKS_BY_COMPOSER, ["A1"]) == ["SCAN Track"]
+    assert "COVERING INDEX" in results[0]["plan_after"][0]
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+from perf import load
+
+
+def test_percentiles() -> None:
+    assert load._percentiles([]) == {"p50": None, "p95": None, "p99": None}
+    assert load._percentiles([0.3]) == {"p50": 0.3, "p95": 0.3, "p99": 0.3}
+    assert load._percentiles([float(value) for value in range(1, 102)]) == {"p50": 51, "p95": 96, "p99": 100}
+
+
+def test_run_level_counts_missing_turns_as_errors(monkeypatch) -> None:
+    ok = {"time_to_first_event": 0.1, "time_to_completion": 0.5, "error": None}
+    threads = iter(
+        [
+            [ok, ok],
+            # A failed turn ends the thread, its remaining turns never run
+            [ok, {"time_to_first_event": None, "time_to_completion": 0.2, "error": "timeout"}],
+            [{"error": "thread create: refused"}],
+        ]
+    )
+
+    async def run_thread(client, graph_id, script):
+        return next(threads)
+
+    clock = iter([10.0, 12.0])
+    monkeypatch.setattr(load, "run_thread", run_thread)
+    monkeypatch.setattr(load, "SCRIPTS", {"stub": {"context": {}, "turns": ["first", "second"]}})
+    monkeypatch.setattr(load, "time", SimpleNamespace(perf_counter=lambda: next(clock)))
+
+    level = asyncio.run(load.run_level(None, "stub", 3))
+
+    assert level["turns"] == 5
+    assert level["errors"] == 3
+    assert level["error_rate"] == 0.5
+    assert level["wall_time"] == 2.0
+    assert level["throughput"] == 1.5
+    assert level["time_to_completion"]["p50"] == 0.5
+    assert level["error_samples"] == ["thread create: refused", "timeout"]
+
+
+def level(concurrency: int, throughput: float, p95: float | None, error_rate: float = 0.0) -> dict:
+    return {
+        "concurrency": concurrency,
+        "throughput": throughput,
+        "time_to_completion": {"p95": p95},
+        "error_rate": error_rate,
+    }
+
+
+def test_compare_levels_present_in_both_reports() -> None:
+    baseline = {"commit": "aaa", "graphs": {"simple-agent": [level(1, 2.0, 1.0), level(2, 0.0, None)]}}
+    report = {
+        "commit": "bbb",
+        "graphs": {
+            "simple-agent": [level(1, 3.0, 0.5, 0.25), level(2, 1.0, 2.0), level(4, 1.0, 2.0)],
+            "tools-mcp-agent": [level(1, 1.0, 1.0)],
+        },
+    }
+
+    lines = load.compare(report, baseline)
+
+    assert lines[0] == "Comparing bbb against aaa"
+    assert len(lines) == 3
+    assert "throughput  +50.0%" in lines[1]
+    assert "p95 completion  -50.0%" in lines[1]
+    assert "error rate 0.0% -> 25.0%" in lines[1]
+    # No change can be computed from a zero or missing baseline
+    assert "throughput       -" in lines[2]
+    assert "p95 completion       -" in lines[2]
+
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent.mcp_discovery import ToolDiscovery
+
+
+def test_tools_are_discovered_once_on_first_use() -> None:
+    calls = []
+
+    async def discover() -> list:
+        calls.append(1)
+        return ["read_documentation"]
+
+    discovery = ToolDiscovery(discover)
+    assert calls == []
+
+    async def main() -> list:
+        return [await discovery.get(), await discovery.get()]
+
+    assert asyncio.run(main()) == [["read_documentation"], ["read_documentation"]]
+    assert calls == [1]
+
+
+def test_failed_discovery_is_retried_later(caplog: pytest.LogCaptureFixture) -> None:
+    attempts = []
+
+    async def discover() -> list:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("server exited")
+        return ["search_documentation"]
+
+    discovery = ToolDiscovery(discover, retry_interval=0.1)
+    # Carries on without the tools and doesn't retry on every call
+    assert asyncio.run(discovery.get()) == []
+    assert asyncio.run(discovery.get()) == []
+    assert attempts == [1]
+    assert discovery.failures == 1
+    assert "MCP tool discovery failed" in caplog.text
+
+    time.sleep(0.1)
+    assert asyncio.run(discovery.get()) == ["search_documentation"]
+
+
+def test_hanging_discovery_times_out() -> None:
+    release = threading.Event()
+
+    async def discover() -> list:
+        await asyncio.to_thread(release.wait, 5)
+        return ["recommend"]
+
+    discovery = ToolDiscovery(discover, timeout=0.05, retry_interval=60)
+    start = time.monotonic()
+    assert asyncio.run(discovery.get()) == []
+    assert time.monotonic() - start < 1
+
+    # A discovery finishing after the timeout is still used
+    release.set()
+    time.sleep(0.1)
+    assert asyncio.run(discovery.get()) == ["recommend"]
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agent.prompts import PromptCacheStats, assemble_messages, static_prompt
+
+
+def test_static_prompt_ignores_indentation() -> None:
+    indented = """
+        Answer briefly.
+        Cite sources.
+    """
+    assert static_prompt(indented) == "Answer briefly.\nCite sources."
+
+
+def test_dynamic_context_comes_after_history() -> None:
+    history = [HumanMessage(content="Hi"), AIMessage(content="Hello")]
+    question = HumanMessage(content="Who built it?")
+
+    messages = assemble_messages("Static.", history, "Summary", None, "Search results", question)
+
+    assert messages[0] == SystemMessage(content="Static.")
+    assert messages[1:3] == history
+    assert messages[3] == HumanMessage(content="Summary\n\nSearch results")
+    assert [type(message) for message in messages].count(SystemMessage) == 1
+    assert messages[4] is question
+
+
+def test_prefix_is_stable_across_turns() -> None:
+    history = [HumanMessage(content="Hi")]
+    first = assemble_messages("Static.", history, "Context of turn 1")
+    second = assemble_messages("Static.", [*history, AIMessage(content="Hello")], "Context of turn 2")
+    assert second[: len(first) - 1] == first[:-1]
+
+
+def test_cached_tokens_are_counted_per_agent() -> None:
+    stats = PromptCacheStats()
+    message = AIMessage(
+        content="",
+        usage_metadata={
+            "input_tokens": 1000,
+            "output_tokens": 10,
+            "total_tokens": 1010,
+            "input_token_details": {"cache_read": 800},
+        },
+    )
+    stats.record("agent", message)
+    stats.record("agent", SimpleNamespace(result=[message]))
+    stats.record("agent", AIMessage(content=""))
+
+    snapshot = stats.snapshot()["agent"]
+    assert snapshot["requests"] == 2
+    assert snapshot["cached_tokens"] == 1600
+    assert snapshot["cached_ratio"] == 0.8
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+import agent.query_log
+from agent.query_log import QueryLog
+
+
+def test_queries_are_recorded_with_their_plan() -> None:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    log = QueryLog()
+    log.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TABLE Track (Name TEXT, Composer TEXT)"))
+        with pytest.raises(OperationalError), log.measure():
+            connection.execute(text("SELECT Nme FROM Track"))
+        with log.measure():
+            connection.execute(text("SELECT Name FROM Track WHERE Composer = :composer"), {"composer": "A1"})
+        # Queries outside of `measure`, e.g. the table info's sample rows, aren't recorded
+        connection.execute(text("SELECT Composer FROM Track"))
+
+    assert log.failures == 1
+    [record] = log.records
+    assert record.sql == "SELECT Name FROM Track WHERE Composer = ?"
+    assert record.parameters == ["A1"]
+    assert record.plan == ["SCAN Track"]
+    assert record.duration_ms >= 0
+
+
+def test_duration_includes_fetching_the_rows() -> None:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    log = QueryLog()
+    log.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TABLE Track (Name TEXT)"))
+        with log.measure():
+            result = connection.execute(text("SELECT Name FROM Track"))
+            time.sleep(0.05)
+            result.fetchall()
+
+    [record] = log.records
+    assert record.duration_ms >= 50
+
+
+def test_plan_is_explained_once_per_distinct_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    explained = []
+    explain_query_plan = agent.query_log.explain_query_plan
+    monkeypatch.setattr(
+        agent.query_log,
+        "explain_query_plan",
+        lambda connection, sql, parameters=None: explained.append(sql) or explain_query_plan(connection, sql, parameters),
+    )
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    log = QueryLog()
+    log.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TABLE Track (Name TEXT)"))
+        for sql in ["SELECT Name FROM Track", "SELECT  Name FROM Track;", "SELECT Name FROM Track ORDER BY Name"]:
+            with log.measure():
+                connection.execute(text(sql)).fetchall()
+
+    assert len(log.records) == 3
+    assert len(explained) == 2
+    assert [record.plan for record in log.records][:2] == [["SCAN Track"], ["SCAN Track"]]
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from agent.scheduler import RateLimits, RequestScheduler, TokenBucket, load_model_limits
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_over_time() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.take(60)
+    assert bucket.wait_time(30) == pytest.approx(30)
+    clock.now = 30
+    assert bucket.wait_time(30) == 0
+    # Oversized requests only wait for a full bucket
+    assert bucket.wait_time(1000) == pytest.approx(30)
+
+
+def test_concurrency_is_capped_per_budget() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000, max_concurrency=2))
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def fake_model() -> None:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    threads = [threading.Thread(target=scheduler.run, args=("key", "model", fake_model)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+    assert scheduler.metrics()["budgets"]
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_rate_limited_requests_are_retried() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000), base_backoff=0.01)
+    attempts = []
+
+    def flaky_model() -> str:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError()
+        return "ok"
+
+    assert scheduler.run("key", "model", flaky_model) == "ok"
+    budget = next(iter(scheduler.metrics()["budgets"].values()))
+    assert budget["retries"] == 2
+    assert "key" not in next(iter(scheduler.metrics()["budgets"]))
+
+
+def test_other_errors_are_not_retried() -> None:
+    scheduler = RequestScheduler(RateLimits())
+    attempts = []
+
+    def broken_model() -> None:
+        attempts.append(1)
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        scheduler.run("key", "model", broken_model)
+    assert len(attempts) == 1
+
+
+def test_async_requests_queue_in_order() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000, max_concurrency=1))
+    order = []
+
+    async def fake_model(i: int) -> None:
+        order.append(i)
+        await asyncio.sleep(0.01)
+
+    async def main() -> None:
+        await asyncio.gather(*(scheduler.arun("key", "model", lambda i=i: fake_model(i)) for i in range(5)))
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_models_without_limits_are_not_throttled() -> None:
+    scheduler = RequestScheduler(model_limits={"llama-3.3-70b-versatile": RateLimits()})
+    assert scheduler.run(None, "gpt-5.1", lambda: "ok", tokens=100_000) == "ok"
+    assert scheduler.metrics()["budgets"] == {}
+
+    scheduler.run(None, "llama-3.3-70b-versatile", lambda: "ok")
+    assert list(scheduler.metrics()["budgets"]) == ["env/llama-3.3-70b-versatile"]
+
+
+def test_limits_are_overridden_per_model() -> None:
+    limits = load_model_limits(
+        '{"llama-3.3-70b-versatile": {"requests_per_minute": 1000}, "qwen/qwen3-32b": null, "custom": {}}'
+    )
+    assert limits["llama-3.3-70b-versatile"] == RateLimits(requests_per_minute=1000, tokens_per_minute=12000)
+    assert "qwen/qwen3-32b" not in limits
+    assert limits["custom"] == RateLimits()
+    assert "gpt-5.1" not in limits
+
+
+def test_cancelled_requests_leave_the_queue_unsent() -> None:
+    scheduler = RequestScheduler(RateLimits(requests_per_minute=1000, max_concurrency=1))
+    release = threading.Event()
+    busy = threading.Thread(target=scheduler.run, args=("key", "model", release.wait))
+    busy.start()
+    time.sleep(0.05)
+
+    cancelled = threading.Event()
+    threading.Timer(0.1, cancelled.set).start()
+    with pytest.raises(CancelledError):
+        scheduler.run("key", "model", lambda: pytest.fail("sent after cancelling"), cancelled=cancelled)
+    assert scheduler.metrics()["queued"] == 0
+
+    release.set()
+    busy.join()
+    admitted: list[str] = []
+    assert scheduler.run("key", "model", lambda: "ok", on_admitted=lambda: admitted.append("model")) == "ok"
+    assert admitted == ["model"]
@@ -0,0 +1,88 @@
+import contextvars
+import threading
+import time
+
+from agent.speculation import SpeculativeCache
+
+
+def test_needed_work_is_a_hit() -> None:
+    cache = SpeculativeCache()
+    cache.start("key", lambda: "result").result()
+    assert cache.result("key", lambda: "fallback") == "result"
+    assert cache.result("key", lambda: "fallback") == "fallback"
+    assert cache.snapshot()["hit_ratio"] == 1
+
+
+def test_discarded_work_is_cancelled_if_not_started() -> None:
+    cache = SpeculativeCache(max_workers=1)
+    release = threading.Event()
+    cache.start("busy", release.wait)
+    cache.start("queued", lambda: "result")
+
+    cache.discard("queued")
+    release.set()
+
+    assert cache.result("queued", lambda: "fallback") == "fallback"
+    assert cache.snapshot()["wasted"] == 1
+
+
+def test_work_not_started_yet_falls_back_right_away() -> None:
+    cache = SpeculativeCache(max_workers=1)
+    release = threading.Event()
+    # Another conversation's speculative search holds the only worker
+    cache.start("busy", release.wait)
+    cache.start("queued", lambda: "result")
+
+    start = time.monotonic()
+    assert cache.result("queued", lambda: "fallback") == "fallback"
+    assert time.monotonic() - start < 0.5
+    assert cache.snapshot()["hits"] == 0
+    release.set()
+
+
+def test_discarded_running_work_stays_cached() -> None:
+    cache = SpeculativeCache()
+    started = threading.Event()
+
+    def search() -> str:
+        started.set()
+        time.sleep(0.01)
+        return "result"
+
+    cache.start("key", search)
+    started.wait()
+    cache.discard("key")
+    # Reused by an identical later request
+    assert cache.start("key", lambda: "again").result() == "result"
+    assert cache.snapshot()["started"] == 1
+
+
+def test_cache_is_bounded() -> None:
+    cache = SpeculativeCache(max_entries=2)
+    for key in range(3):
+        cache.start(key, lambda: None)
+    assert cache.result(0, lambda: "fallback") == "fallback"
+
+
+def test_work_runs_in_the_callers_context() -> None:
+    run_name: contextvars.ContextVar[str] = contextvars.ContextVar("run_name", default="")
+    run_name.set("should_search")
+    cache = SpeculativeCache()
+    cache.start("key", run_name.get).result()
+    assert cache.result("key", lambda: "fallback") == "should_search"
+
+
+def test_failed_work_falls_back_and_is_not_a_hit() -> None:
+    cache = SpeculativeCache()
+
+    def search() -> str:
+        raise TimeoutError()
+
+    cache.start("key", search).exception()
+    assert cache.result("key", lambda: "fallback") == "fallback"
+    assert cache.snapshot()["hits"] == 0
+    assert cache.snapshot()["failed"] == 1
+
+    # Failed work isn't reused by an identical later request
+    cache.start("key", search).exception()
+    assert cache.start("key", lambda: "retried").result() == "retried"
@@ -0,0 +1,56 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from perf import stubs
+
+TASK = "Launch a subagent: sql-agent for queries, analyst-agent for analysis."
+
+
+@pytest.fixture(autouse=True)
+def tool_turns(monkeypatch) -> None:
+    monkeypatch.setattr(stubs, "TOOL_TURNS", {1, 3})
+
+
+def tool_round(name: str) -> list:
+    return [
+        AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": "call_1"}]),
+        ToolMessage(content="done", tool_call_id="call_1"),
+    ]
+
+
+def test_tool_calls_on_listed_turns_only() -> None:
+    tools = {"terminal": "Run shell commands."}
+    first = [HumanMessage(content="List the files.")]
+    second = [*first, *tool_round("terminal"), AIMessage(content="Two files."), HumanMessage(content="And?")]
+    third = [*second, AIMessage(content="That's all."), HumanMessage(content="Again.")]
+
+    calls = stubs._tool_calls(tools, first)
+    assert [(call["name"], call["args"]) for call in calls] == [("terminal", {"commands": "ls"})]
+    assert calls[0]["id"].startswith("call_")
+    assert stubs._tool_calls(tools, second) == []
+    assert len(stubs._tool_calls(tools, third)) == 1
+
+
+def test_answers_once_the_tools_of_the_turn_ran() -> None:
+    messages = [HumanMessage(content="List the files."), *tool_round("terminal")]
+    assert stubs._tool_calls({"terminal": ""}, messages) == []
+
+
+def test_first_known_tool_wins() -> None:
+    calls = stubs._tool_calls({"multiply": "", "terminal": ""}, [HumanMessage(content="6 times 7?")])
+    assert [call["name"] for call in calls] == ["terminal"]
+    assert stubs._tool_calls({"search": ""}, [HumanMessage(content="Hi")]) == []
+
+
+def test_task_delegates_to_described_subagents() -> None:
+    question = [HumanMessage(content="Revenue by country?")]
+
+    both = stubs._tool_calls({"task": TASK}, question)
+    assert [call["args"]["subagent_type"] for call in both] == ["sql-agent", "analyst-agent"]
+    assert len({call["id"] for call in both}) == 2
+
+    sql_only = stubs._tool_calls({"task": "Launch a subagent: sql-agent."}, question)
+    assert [call["args"]["subagent_type"] for call in sql_only] == ["sql-agent"]
+
+    general = stubs._tool_calls({"task": "Launch a general-purpose subagent."}, question)
+    assert [call["args"]["subagent_type"] for call in general] == ["general-purpose"]
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from agent.wiki_loader import ProgressiveWikipediaLoader, WikipediaClient
+
+FIXTURE = Path(__file__).parent / "fixtures" / "wikipedia_eiffel_tower.json"
+
+
+@pytest.fixture
+def client() -> WikipediaClient:
+    """Client answering from a recorded set of MediaWiki API responses."""
+    recorded = json.loads(FIXTURE.read_text())
+
+    def fetch(params: dict) -> bytes:
+        params = {key: str(value) for key, value in params.items()}
+        for key in ("format", "formatversion", "redirects"):
+            params.pop(key)
+        for entry in recorded:
+            if entry["params"] == params:
+                return json.dumps(entry["response"]).encode()
+        raise AssertionError(f"Unexpected request {params}")
+
+    return WikipediaClient(fetch=fetch)
+
+
+def test_only_summaries_are_loaded_by_default(client: WikipediaClient) -> None:
+    docs = ProgressiveWikipediaLoader("Eiffel Tower", client=client).load()
+    assert [doc.metadata["title"] for doc in docs] == ["Eiffel Tower", "Gustave Eiffel"]
+    assert {doc.metadata["section"] for doc in docs} == {"summary"}
+    assert docs[0].metadata["source"] == "https://en.wikipedia.org/wiki/Eiffel_Tower"
+    assert client.stats()["requests"] == 3
+
+
+def test_requested_sections_are_loaded(client: WikipediaClient) -> None:
+    docs = ProgressiveWikipediaLoader("Eiffel Tower", sections=["history of construction"], client=client).load()
+    history = [doc for doc in docs if doc.metadata["section"] == "History"]
+    assert len(history) == 1
+    assert "Maurice Koechlin" in history[0].page_content
+    assert "[1]" not in history[0].page_content
+    assert "Ignored" not in history[0].page_content
+    assert all(doc.metadata["section"] != "Design" for doc in docs)
+
+
+def test_loading_is_lazy(client: WikipediaClient) -> None:
+    first = next(ProgressiveWikipediaLoader("Eiffel Tower", sections=["design"], client=client).lazy_load())
+    assert first.metadata["section"] == "summary"
+    assert client.stats()["requests"] == 2
+
+
+def test_fetched_pages_are_cached(client: WikipediaClient) -> None:
+    ProgressiveWikipediaLoader("Eiffel Tower", sections=["design"], client=client).load()
+    fetched = client.stats()["bytes_fetched"]
+    ProgressiveWikipediaLoader("Eiffel Tower", sections=["design"], client=client).load()
+    assert client.stats()["bytes_fetched"] == fetched
+    assert client.stats()["cache_hits"] > 0
+
+
+def test_cache_is_bounded(client: WikipediaClient) -> None:
+    client.max_entries = 2
+    client.summary("Eiffel Tower")
+    client.summary("Gustave Eiffel")
+    client.summary("Eiffel Tower")
+    client.search("Eiffel Tower", 2)
+    assert client.stats()["cached"] == 2
+
+    # The least recently used entry was evicted, the other one is still cached
+    client.summary("Eiffel Tower")
+    assert client.stats()["requests"] == 3
+    client.summary("Gustave Eiffel")
+    assert client.stats()["requests"] == 4